@@ -0,0 +1,103 @@
+# api/resources.py
+
+from django.contrib.auth import get_user_model
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+class Resource:
+    """Описание типа объектов API.
+
+    fields - атрибуты, которые можно запросить через ?fields=,
+    relations - связи: в объекте выводится id, а сам связанный объект
+    подгружается в included через ?include=.
+    """
+    type = None
+    model = None
+    fields = {}
+    relations = {}
+
+    def serialize(self, obj, fields=None):
+        data = {'type': self.type, 'id': obj.pk}
+        for name, getter in self.fields.items():
+            if fields is None or name in fields:
+                data[name] = getter(obj)
+        for name in self.relations:
+            if fields is None or name in fields:
+                data[name] = getattr(obj, f'{name}_id')
+        return data
+
+    def field_names(self):
+        return {*self.fields, *self.relations}
+
+
+class UserResource(Resource):
+    type = 'users'
+    model = User
+    # Почта и служебные поля пользователя наружу не отдаются
+    fields = {
+        'username': lambda user: user.username,
+        'first_name': lambda user: user.first_name,
+        'last_name': lambda user: user.last_name,
+    }
+
+
+class GroupResource(Resource):
+    type = 'groups'
+    model = Group
+    fields = {
+        'title': lambda group: group.title,
+        'slug': lambda group: group.slug,
+        'description': lambda group: group.description,
+    }
+
+
+class PostResource(Resource):
+    type = 'posts'
+    model = Post
+    fields = {
+        'text': lambda post: post.text,
+        'pub_date': lambda post: _isoformat(post.pub_date),
+        'image': lambda post: post.image.url if post.image else None,
+        'comments_count': lambda post: post.comments_count,
+    }
+    relations = {
+        'author': 'users',
+        'group': 'groups',
+    }
+
+
+class CommentResource(Resource):
+    type = 'comments'
+    model = Comment
+    fields = {
+        'text': lambda comment: comment.text,
+        'created': lambda comment: _isoformat(comment.created),
+    }
+    relations = {
+        'author': 'users',
+        'post': 'posts',
+    }
+
+
+class FollowResource(Resource):
+    type = 'follows'
+    model = Follow
+    relations = {
+        'user': 'users',
+        'author': 'users',
+    }
+
+
+RESOURCES = {
+    resource.type: resource()
+    for resource in (
+        UserResource, GroupResource, PostResource, CommentResource,
+        FollowResource,
+    )
+}
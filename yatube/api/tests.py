@@ -0,0 +1,156 @@
+# api/tests.py
+
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='api_author', email='author@example.com')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='Группа API', slug='api-group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author,
+                group=cls.group if number % 2 else None,
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            text='Комментарий', author=cls.reader, post=cls.posts[0])
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, query=None, **kwargs):
+        return self.client.get(reverse(f'api:{name}', kwargs=kwargs), query)
+
+    def test_post_list_pages_with_cursors(self):
+        """Посты отдаются страницами, ссылки ведут на соседние"""
+        response = self.get('post_list', {'limit': 2})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        document = response.json()
+        ids = [post['id'] for post in document['data']]
+        self.assertEqual(ids, [post.pk for post in self.posts[:-3:-1]])
+        self.assertIsNone(document['links']['prev'])
+        document = self.client.get(document['links']['next']).json()
+        self.assertEqual(
+            [post['id'] for post in document['data']],
+            [post.pk for post in self.posts[-3:-5:-1]],
+        )
+        document = self.client.get(document['links']['prev']).json()
+        self.assertEqual([post['id'] for post in document['data']], ids)
+
+    def test_comment_list_pages_by_id(self):
+        """Комментарии листаются курсором по id, новые первыми"""
+        comments = [
+            Comment.objects.create(
+                text=f'Ответ {number}', author=self.author,
+                post=self.posts[0])
+            for number in range(3)
+        ]
+        expected = [
+            comment.pk for comment in Comment.objects.filter(
+                post=self.posts[0]).order_by('-pk')
+        ]
+        document = self.get(
+            'comment_list', {'limit': 3}, post_id=self.posts[0].pk).json()
+        self.assertEqual(
+            [comment['id'] for comment in document['data']], expected[:3])
+        self.assertEqual(expected[0], comments[-1].pk)
+        document = self.client.get(document['links']['next']).json()
+        self.assertEqual(
+            [comment['id'] for comment in document['data']], expected[3:])
+        self.assertIsNone(document['links']['next'])
+        document = self.client.get(document['links']['prev']).json()
+        self.assertEqual(
+            [comment['id'] for comment in document['data']], expected[:3])
+
+    def test_include_uses_constant_number_of_queries(self):
+        """Связанные объекты подгружаются одним запросом на тип"""
+        query = {'include': 'author,group', 'limit': 2}
+        with self.assertNumQueries(3):
+            self.get('post_list', query)
+        query['limit'] = 5
+        with self.assertNumQueries(3):
+            document = self.get('post_list', query).json()
+        self.assertEqual(
+            [(item['type'], item['id']) for item in document['included']],
+            [('groups', self.group.pk), ('users', self.author.pk)],
+        )
+
+    def test_sparse_fieldsets(self):
+        """?fields= оставляет только запрошенные поля"""
+        document = self.get('post_list', {
+            'fields': 'text', 'include': 'author',
+            'fields[users]': 'username',
+        }).json()
+        self.assertEqual(set(document['data'][0]), {'type', 'id', 'text'})
+        self.assertEqual(
+            document['included'][0],
+            {'type': 'users', 'id': self.author.pk,
+             'username': 'api_author'},
+        )
+        self.assertNotIn('email', str(document))
+
+    def test_bad_parameters(self):
+        """Неизвестные поля и связи - ответ 400 со списком ошибок"""
+        for query in (
+            {'fields': 'password'},
+            {'include': 'comments'},
+            {'limit': 1000},
+        ):
+            with self.subTest(query=query):
+                response = self.get('post_list', query)
+                self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+                self.assertTrue(response.json()['errors'])
+
+    def test_strong_etag(self):
+        """На совпавший If-None-Match отдаётся 304 без тела"""
+        url = reverse('api:post_detail', kwargs={'post_id': self.posts[0].pk})
+        etag = self.client.get(url)['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        Post.objects.filter(pk=self.posts[0].pk).update(text='Новый текст')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_detail_and_nested_lists(self):
+        """Группа, комментарии поста и 404 для несуществующих"""
+        document = self.get('group_detail', slug='api-group').json()
+        self.assertEqual(document['data']['title'], 'Группа API')
+        document = self.get(
+            'comment_list', {'include': 'author'},
+            post_id=self.posts[0].pk).json()
+        self.assertEqual(document['data'][0]['text'], 'Комментарий')
+        self.assertEqual(document['included'][0]['id'], self.reader.pk)
+        response = self.get('group_detail', slug='missing')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def test_follows_only_for_owner(self):
+        """Подписки видны только авторизованному владельцу"""
+        response = self.get('follow_list')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.client.force_login(self.reader)
+        document = self.get('follow_list').json()
+        self.assertEqual(document['data'][0]['author'], self.author.pk)
+        self.client.force_login(self.author)
+        self.assertEqual(self.get('follow_list').json()['data'], [])
@@ -0,0 +1,204 @@
+# api/views.py
+
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.views.decorators.vary import vary_on_cookie
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import CursorPaginator
+
+from .resources import RESOURCES
+
+# Больше записей на страницу клиент запросить не может
+MAX_LIMIT: int = 100
+# Порядок списков, кроме постов: новые записи первыми, ключ курсора - id
+ID_ORDERING = ('-pk',)
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class ApiError(Exception):
+    def __init__(self, status, *messages):
+        super().__init__(*messages)
+        self.status = status
+        self.messages = messages
+
+
+def _error_response(status, messages):
+    return JsonResponse(
+        {'errors': list(messages)}, status=status,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def api_view(view):
+    """Оборачивает ответ view в JSON с сильным ETag.
+
+    view возвращает словарь документа или бросает ApiError. ETag - хэш
+    тела ответа, поэтому совпадает, пока не изменились сами данные, и
+    на If-None-Match отдаётся 304 без тела.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            response = _error_response(405, ['Метод не поддерживается'])
+            response['Allow'] = ', '.join(SAFE_METHODS)
+            return response
+        try:
+            document = view(request, *args, **kwargs)
+        except ApiError as error:
+            return _error_response(error.status, error.messages)
+        except Http404:
+            return _error_response(404, ['Объект не найден'])
+        response = JsonResponse(
+            document, json_dumps_params={'ensure_ascii': False})
+        set_response_etag(response)
+        return get_conditional_response(
+            request, etag=response['ETag'], response=response)
+    return wrapper
+
+
+def _split(value):
+    return [item for item in value.split(',') if item]
+
+
+def _fields(request, resource, param='fields'):
+    """Набор полей из ?fields= (?fields[тип]=) или None - все поля."""
+    if param not in request.GET:
+        return None
+    fields = set(_split(request.GET[param]))
+    unknown = fields - resource.field_names()
+    if unknown:
+        raise ApiError(400, *(
+            f'Неизвестное поле {resource.type}: {name}'
+            for name in sorted(unknown)
+        ))
+    return fields
+
+
+def _includes(request, resource):
+    includes = _split(request.GET.get('include', ''))
+    unknown = [name for name in includes if name not in resource.relations]
+    if unknown:
+        raise ApiError(400, *(
+            f'Нельзя подгрузить {name} для {resource.type}'
+            for name in unknown
+        ))
+    return includes
+
+
+def _included(request, resource, objects, includes):
+    """Связанные объекты: один запрос in_bulk на каждый тип."""
+    ids_by_type = {}
+    for name in includes:
+        ids = ids_by_type.setdefault(resource.relations[name], set())
+        ids.update(getattr(obj, f'{name}_id') for obj in objects)
+    included = []
+    for type_name, ids in sorted(ids_by_type.items()):
+        ids.discard(None)
+        if not ids:
+            continue
+        related = RESOURCES[type_name]
+        fields = _fields(request, related, f'fields[{type_name}]')
+        rows = related.model.objects.in_bulk(ids)
+        included.extend(
+            related.serialize(rows[pk], fields) for pk in sorted(rows))
+    return included
+
+
+def _document(request, resource, objects, many=True):
+    fields = _fields(request, resource)
+    includes = _includes(request, resource)
+    data = [resource.serialize(obj, fields) for obj in objects]
+    document = {'data': data if many else data[0]}
+    if includes:
+        document['included'] = _included(
+            request, resource, objects, includes)
+    return document
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_PER_PAGE))
+    except ValueError:
+        raise ApiError(400, 'limit должен быть числом')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(400, f'limit должен быть от 1 до {MAX_LIMIT}')
+    return limit
+
+
+def _link(request, param, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query[param] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+def _list(request, resource, queryset, ordering=ID_ORDERING):
+    # Параметры проверяются до запроса страницы
+    _fields(request, resource)
+    _includes(request, resource)
+    paginator = CursorPaginator(queryset, _limit(request), ordering=ordering)
+    page = paginator.cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    document = _document(request, resource, page.object_list)
+    document['links'] = {
+        'next': _link(request, 'after', paginator.next_cursor),
+        'prev': _link(request, 'before', paginator.previous_cursor),
+    }
+    return document
+
+
+@api_view
+def post_list(request):
+    posts = Post.objects.all()
+    if 'group' in request.GET:
+        posts = posts.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        posts = posts.filter(author__username=request.GET['author'])
+    return _list(
+        request, RESOURCES['posts'], posts, CursorPaginator.ordering)
+
+
+@api_view
+def post_detail(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    return _document(request, RESOURCES['posts'], [post], many=False)
+
+
+@api_view
+def comment_list(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = Comment.objects.filter(post_id=post_id)
+    return _list(request, RESOURCES['comments'], comments)
+
+
+@api_view
+def group_list(request):
+    return _list(request, RESOURCES['groups'], Group.objects.all())
+
+
+@api_view
+def group_detail(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _document(request, RESOURCES['groups'], [group], many=False)
+
+
+@vary_on_cookie
+@api_view
+def follow_list(request):
+    # Подписки видны только самому пользователю, как и лента /follow/
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация')
+    follows = Follow.objects.filter(user=request.user)
+    if 'author' in request.GET:
+        follows = follows.filter(author__username=request.GET['author'])
+    return _list(request, RESOURCES['follows'], follows)
@@ -0,0 +1,147 @@
+# core/cache.py
+
+import calendar
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+# Сколько секунд старая копия живёт после истечения, пока её пересобирают
+STALE_TIMEOUT: int = 60 * 60
+# Блокировка пересборки снимается сама, если воркер упал на полпути
+REBUILD_LOCK_TIMEOUT: int = 30
+# Сколько ждать чужую пересборку, когда отдать нечего
+REBUILD_WAIT: float = 2.0
+REBUILD_POLL_INTERVAL: float = 0.05
+# Чем больше, тем раньше дорогие записи обновляются до истечения
+EARLY_REFRESH_BETA: float = 1.0
+
+
+def _is_expiring(expires, delta):
+    # Вероятностное раннее обновление (XFetch): чем ближе истечение и
+    # чем дольше сборка, тем вероятнее пересобрать запись заранее
+    jitter = -math.log(1.0 - random.random())
+    return time.time() + delta * EARLY_REFRESH_BETA * jitter >= expires
+
+
+def _rebuild(key, build, timeout, version, cacheable):
+    started = time.monotonic()
+    value = build()
+    if cacheable is None or cacheable(value):
+        delta = time.monotonic() - started
+        entry = (version, value, time.time() + timeout, delta)
+        cache.set(key, entry, timeout + STALE_TIMEOUT)
+    return value
+
+
+def get_or_rebuild(key, build, timeout, version=None, cacheable=None):
+    """Значение из кэша с защитой от одновременной пересборки.
+
+    Запись устаревает по времени или при смене version. Пересобирает
+    её один воркер под блокировкой, остальные тем временем отдают
+    старую копию; незадолго до истечения запись обновляется заранее.
+    cacheable решает, можно ли сохранить результат build.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        entry_version, value, expires, delta = entry
+        if entry_version == version and not _is_expiring(expires, delta):
+            return value
+
+    lock_key = f'{key}:rebuild'
+    if cache.add(lock_key, True, REBUILD_LOCK_TIMEOUT):
+        try:
+            return _rebuild(key, build, timeout, version, cacheable)
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        return value
+    # Первой копии ещё нет: ждём, пока её соберёт другой воркер
+    deadline = time.monotonic() + REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REBUILD_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+    return build()
+
+
+def _is_cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def page_cache_key(key_prefix, request):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'page:{key_prefix}:{url}'
+
+
+def cache_page_for_anonymous(timeout, key_prefix, version=None):
+    """Замена cache_page только для гостей, без лавины пересборок.
+
+    Шапка страницы у авторизованного пользователя своя, поэтому целиком
+    кэшируется лишь гостевая версия; авторизованные получают живой ответ.
+    version - функция от запроса и аргументов view, возвращающая версию
+    данных страницы: пока новая версия собирается, гости видят прежнюю.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated or request.method != 'GET':
+                return view_func(request, *args, **kwargs)
+            page_version = None
+            if version is not None:
+                page_version = version(request, *args, **kwargs)
+            return get_or_rebuild(
+                page_cache_key(key_prefix, request),
+                lambda: view_func(request, *args, **kwargs),
+                timeout,
+                version=page_version,
+                cacheable=_is_cacheable_response,
+            )
+        return wrapper
+    return decorator
+
+
+def conditional_page(validators):
+    """Условный GET: 304 Not Modified до выполнения view.
+
+    validators - функция от запроса и аргументов view, возвращающая пару
+    (etag, last_modified) или None, если проверять нечего (например,
+    объекта нет и view ответит 404). Считаться она должна дёшево: ради
+    неё страница не собирается, только сверяются версии данных.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            validated = None
+            if request.method in ('GET', 'HEAD'):
+                validated = validators(request, *args, **kwargs)
+            if validated is None:
+                return view_func(request, *args, **kwargs)
+            etag, last_modified = validated
+            etag = quote_etag(etag)
+            timestamp = None
+            if last_modified is not None:
+                timestamp = calendar.timegm(last_modified.utctimetuple())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp)
+            if response is not None:
+                return response
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,239 @@
+# core/cache_backends.py
+
+import os
+import pickle
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Через сколько секунд повторное чтение ключа обновляет отметку LRU:
+# точность вытеснения в обмен на отсутствие записи при каждом чтении
+ACCESS_RESOLUTION: int = 60
+MMAP_SIZE: int = 64 * 1024 * 1024
+# Счётчики попаданий копятся в процессе и сбрасываются в файл пачками
+STATS_FLUSH_EVERY: int = 100
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL,'
+    ' expires REAL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_stats ('
+    ' name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+    "INSERT OR IGNORE INTO cache_stats VALUES ('hits', 0), ('misses', 0)",
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех воркеров на одном хосте.
+
+    Файл открыт в режиме WAL: читатели не блокируют писателя, а чтение
+    идёт через mmap. Размер ограничен MAX_ENTRIES, при переполнении
+    вытесняются давно не читанные ключи. stats() отдаёт попадания и
+    промахи, накопленные всеми процессами.
+
+    CACHES = {'default': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': '/var/tmp/yatube/cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 10000, 'ACCESS_RESOLUTION': 60},
+    }}
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._mmap_size = int(options.get('MMAP_SIZE', MMAP_SIZE))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._access_resolution = float(
+            options.get('ACCESS_RESOLUTION', ACCESS_RESOLUTION))
+        self._connection = None
+        self._pid = None
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def _db(self):
+        # После fork соединение родителя использовать нельзя
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = self._connect()
+            self._pid = os.getpid()
+        return self._connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path, timeout=self._busy_timeout, isolation_level=None,
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(f'PRAGMA mmap_size={self._mmap_size}')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE сразу берёт блокировку записи, чтобы параллельные
+        # воркеры ждали busy_timeout, а не падали посреди транзакции
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _count(self, hits=0, misses=0):
+        self._hits += hits
+        self._misses += misses
+        if self._hits + self._misses >= STATS_FLUSH_EVERY:
+            self._flush_stats()
+
+    def _flush_stats(self):
+        if not (self._hits or self._misses):
+            return
+        with self._transaction() as db:
+            db.executemany(
+                'UPDATE cache_stats SET value = value + ? WHERE name = ?',
+                [(self._hits, 'hits'), (self._misses, 'misses')],
+            )
+        self._hits = self._misses = 0
+
+    def _read(self, keys):
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._db.execute(
+            f'SELECT key, value, accessed FROM cache WHERE key IN '
+            f'({placeholders}) AND (expires IS NULL OR expires > ?)',
+            [*keys, now],
+        ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if accessed <= now - self._access_resolution]
+        if stale:
+            with self._transaction() as db:
+                db.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?',
+                    [(now, key) for key in stale],
+                )
+        self._count(hits=len(rows), misses=len(keys) - len(rows))
+        return {key: pickle.loads(value) for key, value, _ in rows}
+
+    def _write(self, db, key, value, timeout, mode):
+        return db.execute(
+            f'INSERT OR {mode} INTO cache (key, value, expires, accessed) '
+            f'VALUES (?, ?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+             self.get_backend_timeout(timeout), time.time()),
+        ).rowcount
+
+    def _cull(self, db):
+        if self._max_entries is None:
+            return
+        db.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),),
+        )
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        excess = count - self._max_entries
+        if self._cull_frequency:
+            excess = max(excess, count // self._cull_frequency)
+        else:
+            excess = count
+        db.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (excess,),
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        keys_map = {self._key(key, version): key for key in keys}
+        found = self._read(list(keys_map))
+        return {keys_map[key]: value for key, value in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            self._write(db, key, value, timeout, 'REPLACE')
+            self._cull(db)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._transaction() as db:
+            for key, value in data.items():
+                self._write(
+                    db, self._key(key, version), value, timeout, 'REPLACE'
+                )
+            self._cull(db)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            # Просроченная запись не мешает добавить ключ заново
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            added = self._write(db, key, value, timeout, 'IGNORE')
+            self._cull(db)
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            return bool(db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount)
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        with self._transaction() as db:
+            db.executemany(
+                'DELETE FROM cache WHERE key = ?',
+                [(self._key(key, version),) for key in keys],
+            )
+
+    def clear(self):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache')
+
+    def stats(self):
+        """Попадания, промахи и число записей по всем процессам."""
+        self._flush_stats()
+        db = self._db
+        stats = dict(db.execute('SELECT name, value FROM cache_stats'))
+        stats['entries'] = db.execute(
+            'SELECT COUNT(*) FROM cache').fetchone()[0]
+        return stats
@@ -0,0 +1,86 @@
+# core/images.py
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+
+from .storage import content_hash
+
+
+def oversized_upload_message():
+    return 'Файл больше {} МБ'.format(
+        settings.IMAGE_UPLOAD_MAX_BYTES // 1024 ** 2)
+
+
+def check_image_limits(upload):
+    """Проверяет загрузку по размеру файла и заголовку картинки.
+
+    forms.ImageField к этому моменту открыл файл через Pillow, а тот
+    читает только заголовок: пиксели ещё не декодированы, и картинку
+    с огромными размерами можно отклонить до того, как она займёт память.
+    """
+    # Обычно большой файл обрывает ещё UploadSizeLimitHandler
+    if upload.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise ValidationError(oversized_upload_message())
+    image = upload.image
+    if image.format not in settings.IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            'Поддерживаются форматы: %(formats)s',
+            params={'formats': ', '.join(settings.IMAGE_UPLOAD_FORMATS)},
+        )
+    width, height = image.size
+    if (max(width, height) > settings.IMAGE_UPLOAD_MAX_SIDE
+            or width * height > settings.IMAGE_UPLOAD_MAX_PIXELS):
+        raise ValidationError(
+            'Слишком большое изображение: %(width)s x %(height)s',
+            params={'width': width, 'height': height},
+        )
+
+
+def _source_path(upload, directory):
+    if hasattr(upload, 'temporary_file_path'):
+        return upload.temporary_file_path()
+    path = os.path.join(directory, 'source')
+    upload.seek(0)
+    with open(path, 'wb') as source:
+        shutil.copyfileobj(upload, source)
+    return path
+
+
+def reencode_image(upload):
+    """Перекодирует загрузку в подпроцессе с лимитами памяти и времени.
+
+    Возвращает новый файл без метаданных с уже посчитанным хэшем для
+    хранилища по содержимому; любой сбой декодера, включая нехватку
+    памяти, становится ошибкой валидации, а не падением воркера.
+    """
+    target = tempfile.NamedTemporaryFile()
+    with tempfile.TemporaryDirectory() as directory:
+        command = [
+            sys.executable, '-m', 'core.reencode',
+            _source_path(upload, directory), target.name,
+            str(settings.IMAGE_UPLOAD_MAX_PIXELS),
+            str(settings.IMAGE_REENCODE_MEMORY_LIMIT),
+        ]
+        try:
+            result = subprocess.run(
+                command,
+                cwd=settings.BASE_DIR,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=settings.IMAGE_REENCODE_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            result = None
+    if result is None or result.returncode != 0:
+        target.close()
+        raise ValidationError('Не удалось обработать изображение')
+    reencoded = File(target, name=upload.name)
+    reencoded.content_hash = content_hash(reencoded)
+    return reencoded
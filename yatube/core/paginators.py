@@ -0,0 +1,111 @@
+# core/paginators.py
+
+import json
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+# Дальше этого числа записи в списках админки не считаются
+COUNT_LIMIT: int = 10000
+
+
+def _postgresql_estimate(queryset, connection):
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            # Статистика таблицы, которую обновляют VACUUM и ANALYZE
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+        else:
+            # Для выборки с фильтрами - оценка строк из плана запроса
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    if queryset.query.where:
+        plan = row[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    # До первого ANALYZE reltuples равен -1 (или 0 в старых версиях)
+    return row[0] if row[0] > 0 else None
+
+
+def _sqlite_estimate(queryset, connection):
+    # SQLite оценивает только таблицу целиком, по данным ANALYZE
+    if queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return int(row[0].split()[0])
+
+
+ESTIMATORS = {
+    'postgresql': _postgresql_estimate,
+    'sqlite': _sqlite_estimate,
+}
+
+
+def estimate_count(queryset):
+    """Число строк выборки по статистике планировщика или None."""
+    connection = connections[queryset.db]
+    estimator = ESTIMATORS.get(connection.vendor)
+    if estimator is None:
+        return None
+    try:
+        return estimator(queryset, connection)
+    except DatabaseError:
+        # Нет статистики (sqlite_stat1 до ANALYZE) или прав на каталог
+        return None
+
+
+class BoundedCountPaginator(Paginator):
+    """Paginator без полного COUNT(*) по таблице.
+
+    Считается не больше COUNT_LIMIT + 1 строк: подзапрос с LIMIT
+    останавливается на границе, сколько бы записей ни было в таблице.
+    Если граница достигнута, число записей считается равным ей, а
+    последние страницы списка доступны через фильтры и поиск.
+    """
+    count_limit = COUNT_LIMIT
+
+    @cached_property
+    def count(self):
+        return min(self.probe_count(), self.count_limit)
+
+    def probe_count(self):
+        # Точное число, если оно не больше границы, иначе граница + 1
+        return self.object_list.order_by()[:self.count_limit + 1].count()
+
+
+class EstimatedCountPaginator(BoundedCountPaginator):
+    """Paginator, который за границей COUNT_LIMIT берёт оценку планировщика.
+
+    Небольшие выборки считаются точно. Для больших число записей берётся
+    из статистики базы, а estimated сообщает шаблону, что оно примерное;
+    без статистики выводится «более COUNT_LIMIT».
+    """
+    estimated = False
+    lower_bound = False
+
+    @cached_property
+    def count(self):
+        count = self.probe_count()
+        if count <= self.count_limit:
+            return count
+        self.estimated = True
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < count:
+            self.lower_bound = True
+            return self.count_limit
+        return estimate
@@ -0,0 +1,48 @@
+# core/reencode.py
+
+"""Перекодирование картинки в отдельном процессе с лимитом памяти.
+
+python -m core.reencode <исходник> <результат> <пикселей> <байт памяти>
+
+Модуль не импортирует Django: процесс поднимается на каждую загрузку.
+Метаданные (EXIF, XMP, текстовые блоки PNG) не переносятся, ориентация
+из EXIF применяется к пикселям до сохранения.
+"""
+
+import resource
+import sys
+
+from PIL import Image, ImageOps
+
+JPEG_QUALITY: int = 90
+# Форматы, в которых сохраняются все кадры анимации
+ANIMATED_FORMATS = ('GIF', 'WEBP')
+
+
+def reencode(source, target, max_pixels):
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(source) as image:
+        image_format = image.format
+        if image.width * image.height > max_pixels:
+            raise ValueError('Image is too large')
+        options = {'icc_profile': image.info.get('icc_profile')}
+        if image_format in ANIMATED_FORMATS and getattr(
+                image, 'is_animated', False):
+            image.save(target, image_format, save_all=True, **options)
+            return
+        image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG':
+            options['quality'] = JPEG_QUALITY
+            if image.mode not in ('RGB', 'L', 'CMYK'):
+                image = image.convert('RGB')
+        image.save(target, image_format, **options)
+
+
+def main(source, target, max_pixels, memory_limit):
+    memory_limit = int(memory_limit)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    reencode(source, target, int(max_pixels))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,59 @@
+# core/storage.py
+
+import hashlib
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+def content_hash(content):
+    """sha256 содержимого файла.
+
+    Хэш, уже посчитанный для файла (core.images.reencode_image), берётся
+    готовым, иначе файл читается кусками без загрузки целиком в память.
+    """
+    digest = getattr(content, 'content_hash', None)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        digest = sha256.hexdigest()
+    return digest
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла - хэш его содержимого.
+
+    Одинаковые файлы хранятся один раз: повторное сохранение возвращает
+    имя уже записанного файла. Удалять такой файл можно, только когда на
+    него не осталось ссылок.
+    """
+
+    def claim(self, name):
+        """Учитывает ссылку на файл name до того, как его имя отдано.
+
+        Вызывается в транзакции save; наследник, считающий ссылки,
+        блокирует здесь свою запись о файле, и до коммита его не удалит
+        освобождение последней ссылки и не запишет параллельный save.
+        """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = content_hash(content)
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        name = posixpath.join(directory, digest[:2], digest + extension)
+        with transaction.atomic():
+            self.claim(name)
+            # Под блокировкой файл с этим именем - то же содержимое, и
+            # второй записи с суффиксом к имени не будет
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length=max_length)
@@ -0,0 +1,55 @@
+# core/testing.py
+
+from concurrent.futures import Future
+from contextlib import contextmanager
+from unittest import mock
+
+from django.test import override_settings
+from posts.thumbnails import get_queue
+from yatube import settings as project_settings
+
+# Путь для override_settings(THUMBNAIL_QUEUE=..., MODERATION_QUEUE=...)
+RECORDING_QUEUE: str = 'core.testing.RecordingQueue'
+
+
+class RecordingQueue:
+    """Очередь для тестов, которая только запоминает задачи."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def enqueue(self, func, *args):
+        self.jobs.append((func, args))
+
+
+class RecordingExecutor:
+    """Подмена ProcessPoolExecutor: задачи запоминаются, процессов нет."""
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+
+    def submit(self, func, *args):
+        self.jobs.append((func, args))
+        return Future()
+
+    def shutdown(self, wait=True):
+        pass
+
+
+@contextmanager
+def default_queue(setting):
+    """Очередь setting из настроек проекта, а не тестовых.
+
+    Пул процессов подменяется RecordingExecutor: задачи, ушедшие в пул,
+    попадают в отдаваемый список и не выполняются вовсе.
+    """
+    jobs = []
+    with override_settings(**{setting: getattr(project_settings, setting)}):
+        queue = get_queue(setting)
+        with mock.patch('posts.thumbnails.ProcessPoolExecutor',
+                        lambda **kwargs: RecordingExecutor(jobs)):
+            try:
+                yield jobs
+            finally:
+                if hasattr(queue, 'shutdown'):
+                    queue.shutdown()
@@ -0,0 +1,175 @@
+# core/tests.py
+
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.cache import cache_page_for_anonymous, get_or_rebuild
+from core.cache_backends import SQLiteCache
+from core.uploadhandlers import OversizedUpload, UploadSizeLimitHandler
+from yatube import settings as project_settings
+
+
+class TestCacheLocationTests(SimpleTestCase):
+    def test_tests_do_not_share_site_cache(self):
+        """cache.clear() в тестах не сбрасывает кэш сайта на этом хосте."""
+        self.assertNotEqual(
+            settings.CACHES['default']['LOCATION'],
+            project_settings.CACHES['default']['LOCATION'],
+        )
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_default_cache_is_shared(self):
+        """Проект по умолчанию использует общий файловый кэш."""
+        self.assertIsInstance(caches['default'], SQLiteCache)
+
+    def test_entries_are_shared_between_instances(self):
+        """Запись и сброс одного воркера видны другому."""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('feed', {'posts': [1, 2]})
+        self.assertEqual(second.get('feed'), {'posts': [1, 2]})
+        second.delete('feed')
+        self.assertIsNone(first.get('feed'))
+
+    def test_add_touch_and_expiry(self):
+        """add не перезаписывает живой ключ, просроченный не отдаётся."""
+        backend = self.make_cache()
+        self.assertTrue(backend.add('key', 'first'))
+        self.assertFalse(backend.add('key', 'second'))
+        self.assertEqual(backend.get('key'), 'first')
+        backend.set('key', 'expired', timeout=-1)
+        self.assertIsNone(backend.get('key'))
+        self.assertFalse(backend.has_key('key'))
+        self.assertTrue(backend.add('key', 'again', timeout=None))
+        self.assertTrue(backend.touch('key', timeout=60))
+        self.assertEqual(
+            backend.get_many(['key', 'missing']), {'key': 'again'})
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные ключи."""
+        backend = self.make_cache(MAX_ENTRIES=3, ACCESS_RESOLUTION=0)
+        for key in ('a', 'b', 'c'):
+            backend.set(key, key)
+        backend.get('a')
+        backend.set('d', 'd')
+        self.assertIsNone(backend.get('b'))
+        for key in ('a', 'c', 'd'):
+            with self.subTest(key=key):
+                self.assertEqual(backend.get(key), key)
+        self.assertEqual(backend.stats()['entries'], 3)
+
+    def test_hit_miss_counters(self):
+        """Попадания и промахи суммируются по всем экземплярам."""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('key', 'value')
+        first.get('key')
+        first.get('missing')
+        second.get_many(['key', 'other'])
+        first.stats()
+        stats = second.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 2)
+
+
+class GetOrRebuildTests(SimpleTestCase):
+    def setUp(self):
+        self.builds = []
+
+    def tearDown(self):
+        cache.clear()
+
+    def build(self, value):
+        def build():
+            self.builds.append(value)
+            return value
+        return build
+
+    def test_fresh_entry_is_not_rebuilt(self):
+        """Свежая запись текущей версии отдаётся без пересборки."""
+        get_or_rebuild('key', self.build('v1'), 60, version=1)
+        value = get_or_rebuild('key', self.build('v2'), 60, version=1)
+        self.assertEqual(value, 'v1')
+        self.assertEqual(self.builds, ['v1'])
+
+    def test_new_version_is_rebuilt(self):
+        """Смена версии пересобирает запись."""
+        get_or_rebuild('key', self.build('v1'), 60, version=1)
+        value = get_or_rebuild('key', self.build('v2'), 60, version=2)
+        self.assertEqual(value, 'v2')
+        self.assertEqual(cache.get('key')[1], 'v2')
+
+    def test_stale_copy_served_while_rebuilding(self):
+        """Пока другой воркер пересобирает запись, отдаётся старая копия."""
+        get_or_rebuild('key', self.build('v1'), 60, version=1)
+        cache.add('key:rebuild', True)
+        value = get_or_rebuild('key', self.build('v2'), 60, version=2)
+        self.assertEqual(value, 'v1')
+        self.assertEqual(self.builds, ['v1'])
+
+    def test_expensive_entry_refreshed_early(self):
+        """Долгая сборка обновляется заранее, до истечения записи."""
+        cache.set('key', (1, 'v1', time.time() + 1, 10 ** 6))
+        value = get_or_rebuild('key', self.build('v2'), 60, version=1)
+        self.assertEqual(value, 'v2')
+
+    def test_uncacheable_value_is_not_stored(self):
+        """Результат, отклонённый cacheable, в кэш не попадает."""
+        get_or_rebuild(
+            'key', self.build('v1'), 60, cacheable=lambda value: False)
+        self.assertIsNone(cache.get('key'))
+
+    def test_guest_page_cached_by_version(self):
+        """Гостевая страница пересобирается только при смене версии."""
+        versions = iter((1, 1, 2))
+
+        @cache_page_for_anonymous(60, 'test_page',
+                                  version=lambda request: next(versions))
+        def view(request):
+            self.builds.append(request.path)
+            return HttpResponse(str(len(self.builds)))
+
+        request = RequestFactory().get('/feed/')
+        request.user = AnonymousUser()
+        contents = [view(request).content for _ in range(3)]
+        self.assertEqual(contents, [b'1', b'1', b'2'])
+
+
+@override_settings(IMAGE_UPLOAD_MAX_BYTES=10)
+class UploadSizeLimitHandlerTests(SimpleTestCase):
+    def receive(self, *chunks):
+        handler = UploadSizeLimitHandler()
+        handler.new_file('image', 'big.jpg', 'image/jpeg', None)
+        passed = [handler.receive_data_chunk(chunk, 0) for chunk in chunks]
+        return passed, handler.file_complete(sum(map(len, chunks)))
+
+    def test_small_file_passed_through(self):
+        """Файл в пределах лимита уходит следующим обработчикам."""
+        passed, upload = self.receive(b'12345', b'67890')
+        self.assertEqual(passed, [b'12345', b'67890'])
+        self.assertIsNone(upload)
+
+    def test_big_file_cut_off(self):
+        """Всё сверх лимита не передаётся дальше, форма видит размер."""
+        passed, upload = self.receive(b'12345', b'67890', b'1', b'2')
+        self.assertEqual(passed, [b'12345', b'67890', None, None])
+        self.assertIsInstance(upload, OversizedUpload)
+        self.assertEqual(upload.size, 12)
+        self.assertEqual(upload.read(), b'')
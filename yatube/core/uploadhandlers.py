@@ -0,0 +1,54 @@
+# core/uploadhandlers.py
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class OversizedUpload(UploadedFile):
+    """Файл, приём которого оборван на IMAGE_UPLOAD_MAX_BYTES.
+
+    Содержимого нет, size - сколько байт успело прийти; форма по нему
+    выводит ошибку размера (core.images.oversized_upload_message).
+    """
+
+    def __init__(self, name, content_type, size):
+        super().__init__(None, name, content_type, size)
+
+    def open(self, mode=None):
+        return self
+
+    def read(self, *args, **kwargs):
+        return b''
+
+    def chunks(self, chunk_size=None):
+        return iter(())
+
+    def close(self):
+        pass
+
+
+class UploadSizeLimitHandler(FileUploadHandler):
+    """Обрывает приём файла, как только он превысил IMAGE_UPLOAD_MAX_BYTES.
+
+    Стоит первым в FILE_UPLOAD_HANDLERS: остаток большого файла читается
+    из запроса, но дальше по цепочке не передаётся и не копится ни в
+    памяти, ни во временном файле. Вместо файла форма получает
+    OversizedUpload, а остальные поля запроса разбираются как обычно.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_BYTES:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received <= settings.IMAGE_UPLOAD_MAX_BYTES:
+            return None
+        return OversizedUpload(
+            self.file_name, self.content_type, self.received)
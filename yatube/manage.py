@@ -5,6 +5,10 @@ import sys
 
 
 def main():
+    # Тесты идут со своими настройками (yatube.test_settings)
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault(
+            'DJANGO_SETTINGS_MODULE', 'yatube.test_settings')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
     try:
         from django.core.management import execute_from_command_line
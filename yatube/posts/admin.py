@@ -1,16 +1,178 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ActionForm
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+from core.paginators import EstimatedCountPaginator
 
 from .models import Comment, Follow, Group, Post
+from .moderation import job_progress, start_moderation_job
 
 DEFAULT_FOR_EMPTY: str = '-пусто-'
 
 
-class PostAdmin(admin.ModelAdmin):
+class EstimatedCountMixin:
+    """Список без точного COUNT(*) больших таблиц.
+
+    Общее число записей без фильтров не считается вовсе, а выборка
+    считается точно только до границы; дальше шаблон admin/pagination
+    выводит «примерно N» по статистике планировщика.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class AuthorUsernameFilter(admin.ListFilter):
+    """Фильтр по точному имени автора, введённому в поле ?author=.
+
+    Отдельно от поиска: в search_fields он шёл бы через OR с LIKE по
+    тексту, и перебор таблицы был бы на каждом запросе. Здесь iexact
+    идёт по индексу posts_username_upper_idx, а в боковую панель не
+    выводится список всех пользователей.
+    """
+    title = 'автору'
+    parameter_name = 'author'
+    template = 'admin/username_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.value = params.pop(self.parameter_name, '').strip()
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def queryset(self, request, queryset):
+        if self.value:
+            return queryset.filter(author__username__iexact=self.value)
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'parameter_name': self.parameter_name,
+            'value': self.value,
+            'hidden': [
+                (name, value) for name, value in changelist.params.items()
+                if name != self.parameter_name
+            ],
+            'reset_query_string': changelist.get_query_string(
+                remove=[self.parameter_name]),
+        }
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        required=False,
+        label='Группа',
+        empty_label='Без группы',
+    )
+
+
+class PostAdmin(EstimatedCountMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
     list_editable = ('group',)
-    search_fields = ('text', 'author',)
-    list_filter = ('pub_date',)
+    # Автор ищется отдельным фильтром: см. AuthorUsernameFilter
+    search_fields = ('text',)
+    list_filter = ('pub_date', AuthorUsernameFilter,)
+    list_select_related = ('author', 'group',)
+    autocomplete_fields = ('author', 'group',)
     empty_value_display = DEFAULT_FOR_EMPTY
+    # Массовые действия выполняются фоновой задачей (posts.moderation)
+    action_form = PostActionForm
+    actions = ('regroup_posts', 'delete_posts', 'delete_author_posts',)
+    moderation_confirmation_template = (
+        'admin/posts/post/moderation_confirmation.html')
+    moderation_job_template = 'admin/posts/post/moderation_job.html'
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Штатное удаление загружает в память все комментарии постов
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_urls(self):
+        urls = [
+            path(
+                'moderation/<str:job_id>/',
+                self.admin_site.admin_view(self.moderation_job_view),
+                name='posts_post_moderation_job',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def moderation_job_view(self, request, job_id):
+        progress = job_progress(job_id)
+        if progress is None:
+            raise Http404('Задача не найдена')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': progress['action'],
+            'progress': progress,
+        }
+        return TemplateResponse(
+            request, self.moderation_job_template, context)
+
+    def start_job(self, request, action, posts, *args, title):
+        job_id = start_moderation_job(action, posts, *args, title=title)
+        self.message_user(request, format_html(
+            '{} запущено в фоне: <a href="{}">ход выполнения</a>',
+            title,
+            reverse('admin:posts_post_moderation_job', args=[job_id]),
+        ))
+
+    def confirm(self, request, queryset, action, title):
+        """Страница подтверждения; None, если действие подтверждено."""
+        if request.POST.get('post') == 'yes':
+            return None
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': title,
+            'action': action,
+            'paginator': EstimatedCountPaginator(queryset, 1),
+            'select_across': request.POST.get('select_across', '0'),
+            'selected': request.POST.getlist(admin.ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': admin.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(
+            request, self.moderation_confirmation_template, context)
+
+    def regroup_posts(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.is_valid()
+        group = form.cleaned_data.get('group')
+        self.start_job(
+            request, 'regroup', queryset, group and group.pk,
+            title=f'Перенос постов в группу «{group or "Без группы"}»',
+        )
+    regroup_posts.short_description = 'Перенести в выбранную группу'
+
+    def delete_posts(self, request, queryset):
+        title = 'Удаление постов'
+        response = self.confirm(request, queryset, 'delete_posts', title)
+        if response is None:
+            self.start_job(request, 'delete', queryset, title=title)
+        return response
+    delete_posts.short_description = 'Удалить выбранные посты'
+
+    def delete_author_posts(self, request, queryset):
+        # id авторов фиксируются сразу: выборка постов тает по ходу задачи
+        author_ids = list(queryset.values_list(
+            'author_id', flat=True).order_by().distinct())
+        posts = Post.objects.filter(author_id__in=author_ids)
+        title = 'Удаление всех постов авторов'
+        response = self.confirm(request, posts, 'delete_author_posts', title)
+        if response is None:
+            self.start_job(request, 'delete', posts, title=title)
+        return response
+    delete_author_posts.short_description = (
+        'Удалить все посты авторов выбранных постов')
 
 
 # Знаю, что в одном проекте - один стиль,
@@ -27,18 +189,23 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(EstimatedCountMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'created', 'author', 'post',)
-    search_fields = ('text', 'author', 'post',)
-    list_filter = ('created',)
+    search_fields = ('text',)
+    list_filter = ('created', AuthorUsernameFilter,)
+    list_select_related = ('author', 'post',)
+    autocomplete_fields = ('author', 'post',)
     empty_value_display = DEFAULT_FOR_EMPTY
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(EstimatedCountMixin, admin.ModelAdmin):
     list_display = ('pk', 'user', 'author',)
-    search_fields = ('user', 'author',)
-    list_filter = ('user', 'author',)
+    # Фильтры по пользователям выводили в боковую панель всю таблицу
+    # пользователей, вместо них - поиск по точному имени
+    search_fields = ('=user__username', '=author__username',)
+    list_select_related = ('user', 'author',)
+    autocomplete_fields = ('user', 'author',)
     empty_value_display = DEFAULT_FOR_EMPTY
 
 
@@ -0,0 +1,215 @@
+# posts/cache.py
+
+import hashlib
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.timezone import utc
+
+GENERATION_KEY_PREFIX: str = 'feed_generation'
+COUNT_KEY_PREFIX: str = 'feed_count'
+POST_CARD_KEY_PREFIX: str = 'post_card'
+PAGE_POSTS_KEY_PREFIX: str = 'page_posts'
+POST_CARD_TEMPLATE: str = 'includes/post_frame.html'
+
+GLOBAL_FEED: str = 'global'
+# Название группы выводится в карточках всех лент
+GROUPS_FEED: str = 'groups'
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def author_feed(author_id):
+    return f'author:{author_id}'
+
+
+def timeline_feed(user_id):
+    return f'timeline:{user_id}'
+
+
+def post_feed(post_id):
+    return f'post:{post_id}'
+
+
+def profile_feed(user_id):
+    # Шапка профиля: счётчики подписок и подписчиков
+    return f'profile:{user_id}'
+
+
+def count_feeds(author_id, group_id):
+    """Ленты, в число постов которых входит пост."""
+    feeds = [GLOBAL_FEED, author_feed(author_id)]
+    if group_id:
+        feeds.append(group_feed(group_id))
+    return feeds
+
+
+def _count_key(feed):
+    return f'{COUNT_KEY_PREFIX}:{feed}'
+
+
+def feed_count(feed, queryset):
+    """Число постов ленты из кэша.
+
+    Точный COUNT(*) выполняется, только когда записи нет или она
+    старше FEED_COUNT_STALENESS секунд; между пересчётами число
+    поправляют сигналы публикации и удаления постов.
+    """
+    entry = cache.get(_count_key(feed))
+    if entry is not None:
+        return entry[0]
+    count = queryset.count()
+    staleness = settings.FEED_COUNT_STALENESS
+    cache.set(_count_key(feed), (count, time.time() + staleness), staleness)
+    return count
+
+
+def adjust_feed_counts(feeds, delta):
+    """Сдвигает закэшированные числа постов лент на delta.
+
+    Срок записи не продлевается: параллельная правка может потеряться,
+    но не дольше, чем до пересчёта.
+    """
+    entries = cache.get_many([_count_key(feed) for feed in feeds])
+    for key, (count, recount_at) in entries.items():
+        timeout = recount_at - time.time()
+        if timeout > 0:
+            cache.set(key, (max(count + delta, 0), recount_at), timeout)
+
+
+def _generation_key(feed):
+    return f'{GENERATION_KEY_PREFIX}:{feed}'
+
+
+def feed_version(*feeds):
+    """Версия ленты из поколений её ключей для ключей кэша."""
+    generations = feed_generations(feeds)
+    return ';'.join(f'{feed}={generations[feed]}' for feed in feeds)
+
+
+def feed_generations(feeds):
+    """Поколения лент одним запросом к кэшу.
+
+    Поколение - метка времени последнего изменения ленты: после
+    вытеснения из кэша оно не повторит старое значение.
+    """
+    keys = {_generation_key(feed): feed for feed in feeds}
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), timeout=None)
+        generations.update(cache.get_many(missing))
+    return {feed: generations.get(key) for key, feed in keys.items()}
+
+
+def _page_owner(request):
+    """Чья это копия страницы: пользователь, его сессия и CSRF-токен.
+
+    Страница авторизованного несёт форму с CSRF-токеном, а новый вход
+    меняет и сессию, и токен: копия из кэша браузера с прежним токеном
+    не должна получать 304.
+    """
+    session = getattr(request, 'session', None)
+    return ':'.join((
+        str(request.user.pk),
+        (session and session.session_key) or '',
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ))
+
+
+def page_validators(request, feeds, latest=None, personal=True):
+    """ETag и Last-Modified страницы из поколений её лент.
+
+    latest - время самой новой записи страницы: поколение после
+    вытеснения из кэша начинается заново и может оказаться раньше.
+    Страница авторизованного пользователя своя (personal), поэтому в
+    ETag входят он сам, его сессия и CSRF-токен (_page_owner), а
+    Last-Modified, общий для всех, ему не отдаётся.
+    """
+    personal = personal and request.user.is_authenticated
+    generations = feed_generations(feeds)
+    version = ';'.join(f'{feed}={generations[feed]}' for feed in feeds)
+    raw = f'{version}:{_page_owner(request) if personal else 0}:{latest}'
+    etag = 'W/"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
+    if personal:
+        return etag, None
+    stamps = [generation for generation in generations.values()
+              if generation is not None]
+    modified = latest
+    if stamps:
+        generated = datetime.fromtimestamp(max(stamps) / 10 ** 9, tz=utc)
+        modified = max(modified or generated, generated)
+    return etag, modified
+
+
+def bump_feeds(feeds):
+    generation = time.time_ns()
+    cache.set_many(
+        {_generation_key(feed): generation for feed in feeds}, timeout=None
+    )
+
+
+def post_feeds(author_id, group_id):
+    """Ленты, в которых показывается карточка поста."""
+    feeds = [GLOBAL_FEED, author_feed(author_id)]
+    if group_id:
+        feeds.append(group_feed(group_id))
+    # Ленты подписок версионируются самой новой записью ленты читателя
+    # (см. follow_index), так что новый пост не сдвигает ключ каждого
+    # подписчика
+    return feeds
+
+
+def page_posts_version(key, posts):
+    """Версия постов страницы из их поколений.
+
+    Состав страницы запоминается под key вместе с версией: пока ни один
+    из постов не менялся, страница из базы не читается. Правка,
+    комментарий или удаление поста сдвигают его поколение, и состав
+    читается заново. posts - функция, возвращающая посты страницы.
+    """
+    cache_key = '{}:{}'.format(
+        PAGE_POSTS_KEY_PREFIX, hashlib.md5(key.encode()).hexdigest())
+    saved = cache.get(cache_key)
+    if saved is not None:
+        post_ids, version = saved
+        if feed_version(*map(post_feed, post_ids)) == version:
+            return version
+    post_ids = [post.pk for post in posts()]
+    version = feed_version(*map(post_feed, post_ids))
+    cache.set(cache_key, (post_ids, version), settings.CASHE_TIMEOUT)
+    return version
+
+
+def post_cards(posts, group=None):
+    """HTML карточек постов страницы, собранный из кэша.
+
+    Карточка версионируется поколением поста и названиями групп, так что
+    при новом посте в ленте рендерится только его карточка. group -
+    группа страницы, на ней ссылка на группу в карточке не выводится.
+    """
+    posts = list(posts)
+    generations = feed_generations(
+        [GROUPS_FEED, *(post_feed(post.pk) for post in posts)])
+    keys = [
+        f'{POST_CARD_KEY_PREFIX}:{post.pk}:{generations[post_feed(post.pk)]}'
+        f':{generations[GROUPS_FEED]}:{group is not None}'
+        for post in posts
+    ]
+    cards = cache.get_many(keys)
+    missing = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            missing[key] = render_to_string(
+                POST_CARD_TEMPLATE, {'post': post, 'group': group})
+    if missing:
+        cache.set_many(missing, settings.CASHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
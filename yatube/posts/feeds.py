@@ -0,0 +1,199 @@
+# posts/feeds.py
+
+from collections import namedtuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.db.models import Max
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+from core.cache import cache_page_for_anonymous, conditional_page
+
+from .cache import (GLOBAL_FEED, GROUPS_FEED, author_feed, feed_version,
+                    group_feed, page_validators)
+from .models import POST_REPR_MAX_CHARS, Group, Post, User
+from .utils import CursorPaginator
+
+FEED_ITEMS: int = 20
+
+FeedPage = namedtuple('FeedPage', 'source posts next_url')
+
+
+class PagedAtom1Feed(Atom1Feed):
+    """Atom с ссылкой rel="next" на более старые записи (RFC 5005)."""
+
+    def add_root_elements(self, handler):
+        super().add_root_elements(handler)
+        if self.feed.get('next_url'):
+            handler.addQuickElement(
+                'link', '', {'rel': 'next', 'href': self.feed['next_url']})
+
+
+class PostsFeed(Feed):
+    """Лента постов в Atom.
+
+    Записи берутся страницей по ключу (pub_date, id), как в HTML-лентах:
+    первая страница - FEED_ITEMS самых новых постов, следующие - по
+    ?after= из ссылки rel="next", без OFFSET.
+    """
+    feed_type = PagedAtom1Feed
+
+    def get_source(self, **kwargs):
+        return None
+
+    def posts(self, source):
+        return Post.objects.select_related('author', 'group')
+
+    def get_object(self, request, **kwargs):
+        source = self.get_source(**kwargs)
+        paginator = CursorPaginator(self.posts(source), FEED_ITEMS)
+        page = paginator.cursor_page(after=request.GET.get('after'))
+        next_url = None
+        if paginator.next_cursor:
+            query = urlencode({'after': paginator.next_cursor})
+            next_url = request.build_absolute_uri(f'{request.path}?{query}')
+        return FeedPage(source, page.object_list, next_url)
+
+    def feed_extra_kwargs(self, obj):
+        return {'next_url': obj.next_url}
+
+    def title(self, obj):
+        return 'Yatube'
+
+    def subtitle(self, obj):
+        return 'Последние записи'
+
+    def link(self, obj):
+        return reverse('posts:main_page')
+
+    def items(self, obj):
+        return obj.posts
+
+    def item_title(self, post):
+        return Truncator(post.text).chars(POST_REPR_MAX_CHARS)
+
+    def item_description(self, post):
+        return linebreaks(post.text, autoescape=True)
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', kwargs={'post_id': post.pk})
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_author_link(self, post):
+        return reverse(
+            'posts:profile', kwargs={'username': post.author.username})
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group else []
+
+
+class GroupPostsFeed(PostsFeed):
+    def get_source(self, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def posts(self, group):
+        return group.posts.select_related('author', 'group')
+
+    def title(self, obj):
+        return f'Yatube: {obj.source.title}'
+
+    def subtitle(self, obj):
+        return obj.source.description or f'Записи сообщества {obj.source}'
+
+    def link(self, obj):
+        return reverse('posts:group_list', kwargs={'slug': obj.source.slug})
+
+
+class AuthorPostsFeed(PostsFeed):
+    def get_source(self, username):
+        return get_object_or_404(User, username=username)
+
+    def posts(self, author):
+        return author.posts.select_related('author', 'group')
+
+    def title(self, obj):
+        return f'Yatube: {obj.source.get_full_name() or obj.source}'
+
+    def subtitle(self, obj):
+        return f'Все посты пользователя {obj.source.username}'
+
+    def link(self, obj):
+        return reverse(
+            'posts:profile', kwargs={'username': obj.source.username})
+
+
+# Ленты одни для всех: валидаторы не личные, а кэшируются они той же
+# схемой поколений, что и HTML-страницы, так что новый пост или правка
+# группы сразу дают новую версию
+
+
+def _group_feeds(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return [group_feed(group_id), GROUPS_FEED]
+
+
+def _author_feeds(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return [author_feed(author_id), GROUPS_FEED]
+
+
+def site_feed_validators(request):
+    latest = Post.objects.aggregate(latest=Max('pub_date'))['latest']
+    return page_validators(
+        request, [GLOBAL_FEED, GROUPS_FEED], latest, personal=False)
+
+
+def group_feed_validators(request, slug):
+    group = Group.objects.filter(slug=slug).annotate(
+        latest=Max('posts__pub_date')).values_list('pk', 'latest').first()
+    if group is None:
+        return None
+    group_id, latest = group
+    return page_validators(
+        request, [group_feed(group_id), GROUPS_FEED], latest,
+        personal=False)
+
+
+def author_feed_validators(request, username):
+    author = User.objects.filter(username=username).annotate(
+        latest=Max('posts__pub_date')).values_list('pk', 'latest').first()
+    if author is None:
+        return None
+    author_id, latest = author
+    return page_validators(
+        request, [author_feed(author_id), GROUPS_FEED], latest,
+        personal=False)
+
+
+site_feed = conditional_page(site_feed_validators)(
+    cache_page_for_anonymous(
+        settings.CASHE_TIMEOUT, 'site_feed',
+        version=lambda request: feed_version(GLOBAL_FEED, GROUPS_FEED),
+    )(PostsFeed())
+)
+
+group_posts_feed = conditional_page(group_feed_validators)(
+    cache_page_for_anonymous(
+        settings.CASHE_TIMEOUT, 'group_feed',
+        version=lambda request, slug: feed_version(*_group_feeds(slug)),
+    )(GroupPostsFeed())
+)
+
+author_posts_feed = conditional_page(author_feed_validators)(
+    cache_page_for_anonymous(
+        settings.CASHE_TIMEOUT, 'author_feed',
+        version=lambda request, username: feed_version(
+            *_author_feeds(username)),
+    )(AuthorPostsFeed())
+)
@@ -1,4 +1,7 @@
 from django import forms
+from core.images import (check_image_limits, oversized_upload_message,
+                         reencode_image)
+from core.uploadhandlers import OversizedUpload
 
 from .models import Comment, Post
 
@@ -8,6 +11,14 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Оборванную загрузку ImageField не откроет: вместо общего
+        # «неверное изображение» форма сообщает о размере
+        if isinstance(self.files.get('image'), OversizedUpload):
+            self.fields['image'].error_messages['invalid_image'] = (
+                oversized_upload_message())
+
     def clean_text(self):
         text = self.cleaned_data['text']
 
@@ -18,6 +29,14 @@ class PostForm(forms.ModelForm):
 
         return text
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # Проверяется и перекодируется только новая загрузка
+        if not image or not hasattr(image, 'image'):
+            return image
+        check_image_limits(image)
+        return reencode_image(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta():
@@ -0,0 +1,179 @@
+# posts/images.py
+
+import hashlib
+import json
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete as delete_thumbnails
+
+from .models import StoredImage
+from .thumbnails import (POST_THUMBNAILS, enqueue_image_job,
+                         generate_thumbnail, post_image_file,
+                         thumbnail_is_ready)
+
+VARIANTS_KEY_PREFIX: str = 'image_variants'
+VARIANTS_DIR: str = 'variants'
+VARIANT_QUALITY: int = 80
+
+# Форматы в порядке предпочтения: (расширение, формат Pillow, MIME-тип)
+VARIANT_FORMATS = (
+    ('webp', 'WEBP', 'image/webp'),
+    ('jpg', 'JPEG', 'image/jpeg'),
+)
+
+
+def _variants_key(name):
+    return f'{VARIANTS_KEY_PREFIX}:{name}'
+
+
+def _base_size():
+    return tuple(map(int, settings.DEFAULT_IMAGE_SIZE.split('x')))
+
+
+def variant_size(width):
+    """Размер варианта с пропорциями DEFAULT_IMAGE_SIZE."""
+    base_width, base_height = _base_size()
+    return width, round(width * base_height / base_width)
+
+
+def variant_name(digest, size, ext):
+    """Имя зависит только от содержимого исходника и параметров варианта.
+
+    Одна и та же картинка, загруженная дважды, даёт те же файлы, а
+    смена размеров или качества - новые имена без ручного сброса CDN.
+    """
+    width, height = size
+    return (
+        f'{VARIANTS_DIR}/{digest[:2]}/{digest}/'
+        f'{width}x{height}q{VARIANT_QUALITY}.{ext}'
+    )
+
+
+def _widths(source_width):
+    # Исходник не растягиваем, но хотя бы самый узкий вариант строим
+    widths = [width for width in settings.IMAGE_VARIANT_WIDTHS
+              if width <= source_width]
+    return widths or [min(settings.IMAGE_VARIANT_WIDTHS)]
+
+
+def build_variants(name):
+    """Строит варианты картинки всех ширин и форматов.
+
+    Результат - манифест {расширение: [[ширина, имя файла], ...]},
+    который шаблон читает без обращения к файлам.
+    """
+    with post_image_file(name).storage.open(name, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    image = image.convert('RGB')
+    manifest = {ext: [] for ext, _, _ in VARIANT_FORMATS}
+    for width in _widths(image.width):
+        size = variant_size(width)
+        resized = ImageOps.fit(image, size, Image.LANCZOS)
+        for ext, image_format, _ in VARIANT_FORMATS:
+            filename = variant_name(digest, size, ext)
+            if not default_storage.exists(filename):
+                buffer = BytesIO()
+                resized.save(buffer, image_format, quality=VARIANT_QUALITY)
+                filename = default_storage.save(
+                    filename, ContentFile(buffer.getvalue()))
+            manifest[ext].append([width, filename])
+    cache.set(_variants_key(name), manifest, timeout=None)
+    StoredImage.objects.filter(name=name).update(
+        variants=json.dumps(manifest))
+    return manifest
+
+
+def variants_manifest(name):
+    """Манифест вариантов из кэша, а после вытеснения - из базы."""
+    manifest = cache.get(_variants_key(name))
+    if manifest is None:
+        stored = StoredImage.objects.filter(name=name).values_list(
+            'variants', flat=True).first()
+        if stored:
+            manifest = json.loads(stored)
+            cache.set(_variants_key(name), manifest, timeout=None)
+    return manifest
+
+
+def pregenerate_variants(image):
+    enqueue_image_job(build_variants, image.name)
+
+
+def image_variants(image):
+    """Готовые варианты картинки для <picture> или None.
+
+    Отсутствующие варианты ставятся в очередь на построение.
+    """
+    manifest = variants_manifest(image.name)
+    if manifest is None:
+        pregenerate_variants(image)
+        return None
+    sources = [
+        {'type': mime_type, 'srcset': _srcset(manifest[ext])}
+        for ext, _, mime_type in VARIANT_FORMATS[:-1]
+    ]
+    # В <img> - последний, самый совместимый формат
+    fallback = manifest[VARIANT_FORMATS[-1][0]]
+    base_width, _ = _base_size()
+    width, filename = min(
+        fallback, key=lambda variant: abs(variant[0] - base_width))
+    width, height = variant_size(width)
+    return {
+        'sources': sources,
+        'srcset': _srcset(fallback),
+        'src': default_storage.url(filename),
+        'width': width,
+        'height': height,
+    }
+
+
+def _srcset(variants):
+    return ', '.join(
+        f'{default_storage.url(filename)} {width}w'
+        for width, filename in variants
+    )
+
+
+def warm_image(name):
+    """Строит недостающие превью и варианты картинки.
+
+    Возвращает число построенных; готовые проверяются по KV-хранилищу
+    sorl и манифесту, без обращения к файлам.
+    """
+    built = 0
+    for geometry_string, options in POST_THUMBNAILS:
+        if not thumbnail_is_ready(name, geometry_string, options):
+            generate_thumbnail(name, geometry_string, options)
+            built += 1
+    if variants_manifest(name) is None:
+        build_variants(name)
+        built += 1
+    return built
+
+
+def delete_image(name, manifest=None):
+    """Удаляет файл картинки поста вместе с превью и вариантами."""
+    # Варианты общие для одинакового содержимого; удаляются только
+    # варианты файла, названного своим хэшем, то есть единственного
+    digest = posixpath.splitext(posixpath.basename(name))[0]
+    if manifest is None:
+        manifest = variants_manifest(name) or {}
+    for variants in manifest.values():
+        for _, filename in variants:
+            if f'/{digest}/' in filename:
+                default_storage.delete(filename)
+    cache.delete(_variants_key(name))
+    try:
+        delete_thumbnails(post_image_file(name))
+    except SuspiciousFileOperation:
+        # Старые записи могут ссылаться на файлы вне MEDIA_ROOT
+        pass
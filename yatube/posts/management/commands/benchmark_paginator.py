@@ -0,0 +1,41 @@
+# posts/management/commands/benchmark_paginator.py
+
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import get_template
+from posts.utils import POSTS_PER_PAGE, page_window
+
+PAGE_COUNTS = (10, 100, 1000, 10000, 100000)
+TEMPLATE = 'includes/paginator.html'
+
+
+def render_navigator(num_pages, per_page=POSTS_PER_PAGE):
+    """HTML навигатора для средней страницы ленты из num_pages страниц."""
+    # range не создаёт записи, Paginator считает их через len()
+    paginator = Paginator(range(num_pages * per_page), per_page)
+    page = paginator.page(num_pages // 2 or 1)
+    page.page_window = page_window(page)
+    return get_template(TEMPLATE).render({'page_obj': page})
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время рендера и размер навигатора по страницам '
+            'в зависимости от числа страниц ленты')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Сколько раз рендерить навигатор для каждого замера'
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f'{"Страниц":>10} {"Байт":>8} {"мс на рендер":>14}')
+        for num_pages in PAGE_COUNTS:
+            size = len(render_navigator(num_pages).encode())
+            seconds = timeit.timeit(
+                lambda: render_navigator(num_pages), number=repeat)
+            self.stdout.write(
+                f'{num_pages:>10} {size:>8} {seconds / repeat * 1000:>14.3f}')
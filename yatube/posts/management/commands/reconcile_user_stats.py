@@ -0,0 +1,80 @@
+# posts/management/commands/reconcile_user_stats.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from posts.models import User, UserStats
+from posts.signals import STATS_COUNTERS
+
+BATCH_SIZE: int = 1000
+
+COUNTER_FIELDS = [
+    counter
+    for counters in STATS_COUNTERS.values()
+    for _, counter in counters
+]
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики UserStats по фактическим данным '
+            'и исправляет накопившийся дрейф')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько пользователей пересчитывать за одну транзакцию'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk = 0
+        checked = fixed = 0
+        while True:
+            batch = list(user_ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            checked += len(batch)
+            fixed += self.reconcile(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено пользователей: {checked}, исправлено: {fixed}'
+        ))
+
+    @transaction.atomic
+    def reconcile(self, user_ids):
+        # Сначала блокируем строки статистики: сигналы параллельных
+        # записей дождутся конца пересчёта и применятся поверх него
+        existing = {
+            stats.user_id: stats
+            for stats in UserStats.objects.select_for_update().filter(
+                user_id__in=user_ids)
+        }
+        actual = {
+            user_id: dict.fromkeys(COUNTER_FIELDS, 0) for user_id in user_ids
+        }
+        for model, counters in STATS_COUNTERS.items():
+            for user_field, counter in counters:
+                rows = model.objects.filter(
+                    **{f'{user_field}__in': user_ids}
+                ).values(user_field).annotate(total=Count('pk')).order_by()
+                for row in rows:
+                    actual[row[user_field]][counter] = row['total']
+
+        to_create, to_update = [], []
+        for user_id, counts in actual.items():
+            stats = existing.get(user_id)
+            if stats is None:
+                to_create.append(UserStats(user_id=user_id, **counts))
+                continue
+            drifted = False
+            for counter, value in counts.items():
+                if getattr(stats, counter) != value:
+                    setattr(stats, counter, value)
+                    drifted = True
+            if drifted:
+                to_update.append(stats)
+
+        UserStats.objects.bulk_create(to_create, ignore_conflicts=True)
+        UserStats.objects.bulk_update(to_update, COUNTER_FIELDS)
+        return len(to_create) + len(to_update)
@@ -0,0 +1,45 @@
+# posts/management/commands/resume_moderation_jobs.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from posts.models import ModerationJob
+from posts.moderation import enqueue_job
+
+# Задача без продвижения дольше этого считается потерянной воркером
+STALE_MINUTES: int = 10
+
+
+class Command(BaseCommand):
+    help = ('Снова ставит в очередь задачи модерации и удаления учётных '
+            'записей, потерянные воркером; они продолжаются с места, '
+            'где остановились')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-minutes', type=int, default=STALE_MINUTES,
+            help='Через сколько минут без продвижения задача потеряна'
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Повторить и задачи, завершившиеся ошибкой'
+        )
+
+    def handle(self, *args, **options):
+        statuses = [ModerationJob.QUEUED, ModerationJob.RUNNING]
+        if options['retry_failed']:
+            statuses.append(ModerationJob.FAILED)
+        stale = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        job_ids = list(ModerationJob.objects.filter(
+            status__in=statuses, updated__lte=stale,
+        ).order_by('updated').values_list('pk', flat=True))
+        for job_id in job_ids:
+            # Упавшая задача продолжает с сохранённого шага, а не сначала
+            ModerationJob.objects.filter(
+                pk=job_id, status=ModerationJob.FAILED,
+            ).update(status=ModerationJob.QUEUED, updated=timezone.now())
+            enqueue_job(job_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Снова в очереди задач: {len(job_ids)}'
+        ))
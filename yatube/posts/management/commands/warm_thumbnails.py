@@ -0,0 +1,69 @@
+# posts/management/commands/warm_thumbnails.py
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts.images import warm_image
+from posts.models import Post
+from posts.thumbnails import refresh_image_feeds
+
+logger = logging.getLogger(__name__)
+
+POSTS_LIMIT: int = 1000
+
+
+def warm(name):
+    """Задача воркера: None, если картинку обработать не удалось."""
+    try:
+        return warm_image(name)
+    except Exception:
+        logger.exception('Failed to warm image %s', name)
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Заранее строит превью и варианты картинок новых постов, '
+            'чтобы после выкладки страницы не ждали их построения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=POSTS_LIMIT,
+            help='Сколько последних постов прогревать'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число процессов; 0 - в текущем процессе'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('-pub_date')
+        # Одна картинка бывает у нескольких постов
+        names = list(dict.fromkeys(
+            posts.values_list('image', flat=True)[:options['posts']]))
+        results = self.run(names, options['workers'])
+        built = failed = 0
+        for name, result in zip(names, results):
+            if result is None:
+                failed += 1
+            elif result:
+                built += 1
+                refresh_image_feeds(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено картинок: {len(names)}, прогрето: {built}, '
+            f'с ошибкой: {failed}'
+        ))
+
+    def run(self, names, workers):
+        if not workers:
+            return list(map(warm, names))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as executor:
+            return list(executor.map(
+                warm, names, chunksize=max(1, len(names) // workers // 4)))
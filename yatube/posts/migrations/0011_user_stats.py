@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:44
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# (модель, поле с id пользователя, счётчик UserStats)
+STATS_SOURCES = (
+    ('Post', 'author_id', 'posts_count'),
+    ('Comment', 'author_id', 'comments_count'),
+    ('Follow', 'author_id', 'followers_count'),
+    ('Follow', 'user_id', 'following_count'),
+)
+
+
+def fill_user_stats(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserStats = apps.get_model('posts', 'UserStats')
+    counts = defaultdict(dict)
+    for model_name, user_field, counter in STATS_SOURCES:
+        rows = apps.get_model('posts', model_name).objects.values(
+            user_field).annotate(total=models.Count('pk')).order_by()
+        for row in rows:
+            counts[row[user_field]][counter] = row['total']
+    UserStats.objects.bulk_create(
+        (
+            UserStats(user_id=user_id, **counts.get(user_id, {}))
+            for user_id in User.objects.values_list('pk', flat=True)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0010_auto_20221015_0815'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+                ('user', models.OneToOneField(help_text='Пользователь', on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+                'db_table': 'user_stats',
+            },
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_stored_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedimage',
+            name='variants',
+            field=models.TextField(blank=True, default='', help_text='Манифест вариантов картинки в JSON', verbose_name='Варианты'),
+        ),
+    ]
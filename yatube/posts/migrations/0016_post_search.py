@@ -0,0 +1,90 @@
+# Generated by Django 2.2.16 on 2026-10-18 22:10
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import migrations, router
+
+# Схема индекса на момент миграции: posts.search может меняться, а
+# миграция должна создавать ровно эту таблицу
+SQLITE_SQL = [
+    'CREATE VIRTUAL TABLE posts_search USING fts5('
+    "title, author, text, tokenize = 'unicode61 remove_diacritics 2')",
+    'INSERT INTO posts_search (rowid, title, author, text) '
+    "SELECT p.id, COALESCE(g.title, ''), "
+    "u.username || ' ' || u.first_name || ' ' || u.last_name, p.text "
+    'FROM posts p '
+    'JOIN auth_user u ON u.id = p.author_id '
+    'LEFT JOIN groups g ON g.id = p.group_id',
+]
+
+POSTGRESQL_SQL = [
+    'CREATE TABLE posts_search ('
+    'post_id integer PRIMARY KEY REFERENCES posts (id) '
+    'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+    'document tsvector NOT NULL)',
+    'CREATE INDEX posts_search_document '
+    'ON posts_search USING GIN (document)',
+    (
+        'INSERT INTO posts_search (post_id, document) '
+        'SELECT p.id, '
+        "setweight(to_tsvector(%s::regconfig, COALESCE(g.title, '')), "
+        "'A') || "
+        "setweight(to_tsvector(%s::regconfig, concat_ws(' ', "
+        "u.username, u.first_name, u.last_name)), 'A') || "
+        "setweight(to_tsvector(%s::regconfig, p.text), 'B') "
+        'FROM posts p '
+        'JOIN auth_user u ON u.id = p.author_id '
+        'LEFT JOIN groups g ON g.id = p.group_id',
+        [settings.SEARCH_CONFIG] * 3,
+    ),
+]
+
+DROP_SQL = ['DROP TABLE IF EXISTS posts_search']
+
+
+class RunVendorSQL(migrations.RunSQL):
+    """RunSQL со своим SQL для каждой базы: {vendor: (sql, reverse_sql)}."""
+
+    def __init__(self, sql_by_vendor, **kwargs):
+        super().__init__(sql='', reverse_sql='', **kwargs)
+        self.sql_by_vendor = sql_by_vendor
+
+    def deconstruct(self):
+        kwargs = {'sql_by_vendor': self.sql_by_vendor}
+        if self.hints:
+            kwargs['hints'] = self.hints
+        return self.__class__.__name__, [], kwargs
+
+    def _vendor_sql(self, schema_editor):
+        vendor = schema_editor.connection.vendor
+        try:
+            return self.sql_by_vendor[vendor]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f'Поиск не поддерживает базу {vendor}')
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if router.allow_migrate(
+                schema_editor.connection.alias, app_label, **self.hints):
+            self._run_sql(schema_editor, self._vendor_sql(schema_editor)[0])
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if router.allow_migrate(
+                schema_editor.connection.alias, app_label, **self.hints):
+            self._run_sql(schema_editor, self._vendor_sql(schema_editor)[1])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_storedimage_variants'),
+    ]
+
+    operations = [
+        RunVendorSQL({
+            'sqlite': (SQLITE_SQL, DROP_SQL),
+            'postgresql': (POSTGRESQL_SQL, DROP_SQL),
+        }),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 22:40
+
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'posts_username_upper_idx'
+
+
+def create_username_index(apps, schema_editor):
+    # Поиск админки по '=author__username' в PostgreSQL сравнивает
+    # UPPER(username); в SQLite это LIKE, для него индекс не нужен
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        f'ON {table} (UPPER(username::text))'
+    )
+
+
+def drop_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_post_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_username_index, drop_username_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:47
+
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_username_upper_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Загрузите изображение (не обязательно)', storage=posts.storage.PostImageStorage(), upload_to='posts/', verbose_name='Изображение'),
+        ),
+    ]
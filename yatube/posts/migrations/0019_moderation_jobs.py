@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationJob',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Задача')),
+                ('action', models.CharField(max_length=32, verbose_name='Действие')),
+                ('title', models.CharField(blank=True, max_length=255, verbose_name='Описание')),
+                ('payload', models.BinaryField(help_text='Выборка и аргументы действия в pickle', verbose_name='Аргументы')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='queued', max_length=16, verbose_name='Статус')),
+                ('step', models.PositiveSmallIntegerField(default=0, verbose_name='Шаг')),
+                ('last_pk', models.PositiveIntegerField(default=0, verbose_name='Последний обработанный id')),
+                ('total', models.PositiveIntegerField(null=True, verbose_name='Всего строк')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Ошибка')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлена')),
+            ],
+            options={
+                'verbose_name': 'Задача модерации',
+                'verbose_name_plural': 'Задачи модерации',
+                'db_table': 'moderation_jobs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='moderationjob',
+            index=models.Index(fields=['status', 'updated'], name='moderation_jobs_status_idx'),
+        ),
+    ]
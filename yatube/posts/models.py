@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import PostImageStorage
+
 User = get_user_model()
 
 POST_REPR_MAX_CHARS: int = 30
@@ -61,12 +63,31 @@ class Post(models.Model):
         verbose_name='Изображение',
         help_text='Загрузите изображение (не обязательно)',
         upload_to='posts/',
+        # Одинаковые картинки хранятся одним файлом, см. StoredImage
+        storage=PostImageStorage(),
         blank=True
     )
+    # Денормализованный счётчик для лент, обновляется в posts.signals
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+    )
 
     class Meta:
         db_table = 'posts'
         ordering = ('-pub_date',)
+        # Ключ курсорной пагинации (pub_date, id) для каждой формы ленты
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='posts_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_author_pub_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_group_pub_date_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -106,6 +127,10 @@ class Comment(models.Model):
     class Meta:
         db_table = 'comments'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['post', '-created'], name='comments_post_created_idx'),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -145,6 +170,11 @@ class Follow(models.Model):
             fields=['user', 'author'],
             name='unique_follow')
         ]
+        # unique_follow покрывает поиск по user, этот - по author
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follows_author_user_idx'),
+        ]
 
     def __repr__(self):
         return (
@@ -154,3 +184,206 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user.username} >>> {self.author.username}'
+
+
+class TimelineEntry(models.Model):
+    """Пост во входящей ленте подписчика (fan-out-on-write).
+
+    Записи раскладываются сигналами из posts.signals при публикации
+    поста и при подписке, удаляются при отписке.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+        help_text='Подписчик, в ленту которого попал пост',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+        help_text='Пост автора, на которого подписан читатель',
+    )
+    # Копия Post.pub_date: лента листается по индексу самой таблицы,
+    # без сортировки всех входящих записей через JOIN с постами
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+        help_text='Дата публикации поста',
+    )
+
+    class Meta:
+        db_table = 'timeline'
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'],
+            name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} <<< {self.post_id}'
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя для профиля и поста.
+
+    Обновляются сигналами из posts.signals в той же транзакции, что и
+    сама запись; накопившийся дрейф правит reconcile_user_stats.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Пользователь',
+        help_text='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов',
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Комментариев',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок',
+    )
+
+    class Meta:
+        db_table = 'user_stats'
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'Статистика {self.user.username}'
+
+
+class StoredImage(models.Model):
+    """Файл картинки в хранилище и число постов, которые на него ссылаются.
+
+    Файлы постов адресуются содержимым и общие для одинаковых картинок,
+    поэтому файл удаляется вместе с последней ссылкой (posts.signals).
+    Здесь же хранится манифест готовых вариантов (posts.images), чтобы
+    вытеснение из кэша не заставляло пересобирать их.
+    """
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Файл',
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ссылок',
+    )
+    variants = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Варианты',
+        help_text='Манифест вариантов картинки в JSON',
+    )
+
+    class Meta:
+        db_table = 'stored_images'
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
+
+
+class ModerationJob(models.Model):
+    """Фоновая задача модерации или удаления учётной записи.
+
+    Строка - единственный источник правды о задаче: шаг и последний
+    обработанный id пачки сохраняются в той же транзакции, что и сама
+    пачка, поэтому задача, потерянная воркером, продолжается командой
+    resume_moderation_jobs с того же места.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    id = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name='Задача',
+    )
+    action = models.CharField(
+        max_length=32,
+        verbose_name='Действие',
+    )
+    title = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Описание',
+    )
+    payload = models.BinaryField(
+        verbose_name='Аргументы',
+        help_text='Выборка и аргументы действия в pickle',
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Статус',
+    )
+    step = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Шаг',
+    )
+    last_pk = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Последний обработанный id',
+    )
+    total = models.PositiveIntegerField(
+        null=True,
+        verbose_name='Всего строк',
+    )
+    done = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Обработано строк',
+    )
+    error = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Ошибка',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Обновлена',
+    )
+
+    class Meta:
+        db_table = 'moderation_jobs'
+        verbose_name = 'Задача модерации'
+        verbose_name_plural = 'Задачи модерации'
+        indexes = [
+            models.Index(fields=['status', 'updated'],
+                         name='moderation_jobs_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.title or self.action} ({self.status})'
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
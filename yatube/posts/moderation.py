@@ -0,0 +1,325 @@
+# posts/moderation.py
+
+import logging
+import pickle
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import (adjust_feed_counts, count_feeds, group_feed, post_feed,
+                    post_feeds, profile_feed, timeline_feed)
+from .models import (Comment, Follow, ModerationJob, Post, TimelineEntry,
+                     User, UserStats)
+from .search import index_posts, remove_posts
+from .signals import (bump_feeds_on_commit, change_image_references,
+                      enqueue_followers_backfill)
+from .thumbnails import get_queue
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE: int = 500
+
+
+def _feeds(posts):
+    feeds = set()
+    pairs = posts.values_list('author_id', 'group_id').order_by().distinct()
+    for author_id, group_id in pairs:
+        feeds.update(post_feeds(author_id, group_id))
+    return list(feeds)
+
+
+def _decrease_stats(queryset, counter, user_field='author_id'):
+    rows = queryset.values(user_field).annotate(total=Count('pk')).order_by()
+    for row in rows:
+        UserStats.objects.filter(user_id=row[user_field]).update(
+            **{counter: Greatest(F(counter) - row['total'], 0)})
+
+
+def delete_posts(post_ids):
+    """Удаляет посты одним DELETE на таблицу, без сборщика Django.
+
+    Сигналы удаления при этом не срабатывают, поэтому счётчики, ссылки
+    на картинки, поисковый индекс и кэш лент правятся здесь же, так же
+    одним запросом на группу строк.
+    """
+    with transaction.atomic():
+        posts = Post.objects.filter(pk__in=post_ids)
+        comments = Comment.objects.filter(post_id__in=post_ids)
+        bump_feeds_on_commit(
+            [*_feeds(posts), *map(post_feed, post_ids)])
+        rows = posts.values('author_id', 'group_id').annotate(
+            total=Count('pk')).order_by()
+        for row in rows:
+            adjust_feed_counts(
+                count_feeds(row['author_id'], row['group_id']), -row['total'])
+        _decrease_stats(posts, 'posts_count')
+        _decrease_stats(comments, 'comments_count')
+        images = posts.exclude(image='').values('image').annotate(
+            total=Count('pk')).order_by()
+        for row in images:
+            change_image_references(row['image'], -row['total'])
+        remove_posts(post_ids)
+        # _raw_delete - DELETE ... WHERE без загрузки строк в память
+        comments._raw_delete(comments.db)
+        timeline = TimelineEntry.objects.filter(post_id__in=post_ids)
+        timeline._raw_delete(timeline.db)
+        posts._raw_delete(posts.db)
+
+
+def regroup_posts(post_ids, group_id):
+    """Переносит посты в группу group_id одним UPDATE."""
+    with transaction.atomic():
+        posts = Post.objects.filter(pk__in=post_ids)
+        # Ленты и прежних групп, и новой
+        feeds = [*_feeds(posts), *map(post_feed, post_ids)]
+        moved = 0
+        rows = posts.exclude(group_id=group_id).values('group_id').annotate(
+            total=Count('pk')).order_by()
+        for row in rows:
+            moved += row['total']
+            if row['group_id']:
+                adjust_feed_counts(
+                    [group_feed(row['group_id'])], -row['total'])
+        if group_id:
+            adjust_feed_counts([group_feed(group_id)], moved)
+        posts.update(group_id=group_id)
+        feeds.extend(_feeds(posts))
+        bump_feeds_on_commit(feeds)
+        index_posts(post_ids)
+
+
+def delete_comments(comment_ids):
+    """Удаляет комментарии одним DELETE, поправив счётчики постов."""
+    with transaction.atomic():
+        comments = Comment.objects.filter(pk__in=comment_ids)
+        rows = comments.values('post_id').annotate(
+            total=Count('pk')).order_by()
+        feeds = []
+        for row in rows:
+            Post.objects.filter(pk=row['post_id']).update(
+                comments_count=Greatest(
+                    F('comments_count') - row['total'], 0))
+            feeds.append(post_feed(row['post_id']))
+        feeds.extend(_feeds(
+            Post.objects.filter(pk__in=comments.values('post_id'))))
+        bump_feeds_on_commit(feeds)
+        _decrease_stats(comments, 'comments_count')
+        comments._raw_delete(comments.db)
+
+
+def delete_follows(follow_ids):
+    """Удаляет подписки вместе с записями лент подписчиков."""
+    with transaction.atomic():
+        follows = Follow.objects.filter(pk__in=follow_ids)
+        popular = list(UserStats.objects.filter(
+            user_id__in=follows.values('author_id'),
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True))
+        _decrease_stats(follows, 'followers_count')
+        _decrease_stats(follows, 'following_count', user_field='user_id')
+        feeds = []
+        for user_id, author_id in follows.values_list('user_id', 'author_id'):
+            # TimelineEntry без сигналов: delete() - это один DELETE
+            TimelineEntry.objects.filter(
+                user_id=user_id, post__author_id=author_id).delete()
+            feeds.extend([
+                timeline_feed(user_id),
+                profile_feed(user_id),
+                profile_feed(author_id),
+            ])
+        bump_feeds_on_commit(feeds)
+        follows._raw_delete(follows.db)
+        # Авторы, опустившиеся до порога раскладки, раскладываются заново
+        enqueue_followers_backfill(list(UserStats.objects.filter(
+            user_id__in=popular,
+            followers_count__lte=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True)))
+
+
+def delete_timeline_entries(entry_ids):
+    TimelineEntry.objects.filter(pk__in=entry_ids).delete()
+
+
+ACTIONS = {
+    'delete': delete_posts,
+    'regroup': regroup_posts,
+}
+ACCOUNT_DELETION: str = 'delete_account'
+
+
+class JobTakenOver(Exception):
+    """Задачу продвинул другой воркер, этот отступает."""
+
+
+def _chunks(queryset, last_pk=0):
+    """id строк выборки после last_pk пачками по CHUNK_SIZE, по возрастанию."""
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    while True:
+        chunk = list(ids.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]
+
+
+def _account_steps(user_id):
+    # Порядок шагов такой, чтобы ни один не удалял строки следующих:
+    # иначе счётчик прогресса не дойдёт до общего числа
+    return [
+        (Post.objects.filter(author_id=user_id), delete_posts),
+        (
+            Comment.objects.filter(author_id=user_id).exclude(
+                post__author_id=user_id),
+            delete_comments,
+        ),
+        (TimelineEntry.objects.filter(user_id=user_id),
+         delete_timeline_entries),
+        (
+            Follow.objects.filter(Q(user_id=user_id) | Q(author_id=user_id)),
+            delete_follows,
+        ),
+    ]
+
+
+def _job_steps(job):
+    """Шаги задачи: (выборка, функция, аргументы)."""
+    payload = pickle.loads(job.payload)
+    if job.action == ACCOUNT_DELETION:
+        return _account_steps(*payload)
+    query, *args = payload
+    posts = Post.objects.all()
+    posts.query = query
+    return [(posts, ACTIONS[job.action], *args)]
+
+
+@contextmanager
+def _job_transaction(job, **changes):
+    """Транзакция шага задачи, сохраняющая changes вместе с ним.
+
+    Строка задачи блокируется, и если её состояние уже не то, что
+    видел этот воркер, шаг не выполняется: задачу ведёт другой.
+    """
+    with transaction.atomic():
+        current = ModerationJob.objects.select_for_update().get(pk=job.pk)
+        if (current.status, current.step, current.last_pk) != (
+                job.status, job.step, job.last_pk):
+            raise JobTakenOver(job.pk)
+        yield
+        for field, value in changes.items():
+            setattr(job, field, value)
+        job.save(update_fields=[*changes, 'updated'])
+
+
+def _advance_job(job, **changes):
+    with _job_transaction(job, **changes):
+        pass
+
+
+def _finish_account_deletion(job):
+    user_id, = pickle.loads(job.payload)
+    # Пока шли пачки, пользователя могли снова включить
+    User.objects.filter(pk=user_id, is_active=False).delete()
+
+
+def _run_job(job):
+    """Выполняет шаги задачи пачками по id с сохранённого места.
+
+    Каждая пачка - отдельная транзакция вместе с продвижением задачи,
+    так что прерванная задача оставляет согласованные данные, а её
+    повтор продолжит ровно с первой необработанной строки.
+    """
+    steps = _job_steps(job)
+    total = job.total
+    if total is None:
+        total = sum(queryset.count() for queryset, *_ in steps)
+    _advance_job(job, status=job.RUNNING, error='', total=total)
+    for index in range(job.step, len(steps)):
+        queryset, func, *args = steps[index]
+        for chunk in _chunks(queryset, job.last_pk):
+            with _job_transaction(
+                    job, last_pk=chunk[-1], done=job.done + len(chunk)):
+                func(chunk, *args)
+        _advance_job(job, step=index + 1, last_pk=0)
+    with _job_transaction(job, status=job.DONE):
+        if job.action == ACCOUNT_DELETION:
+            _finish_account_deletion(job)
+
+
+def run_job(job_id):
+    """Задача воркера: выполняет или продолжает задачу job_id."""
+    job = ModerationJob.objects.filter(pk=job_id).first()
+    if job is None or job.finished:
+        return False
+    try:
+        _run_job(job)
+    except JobTakenOver:
+        return False
+    except Exception as error:
+        logger.exception('Moderation job %s failed', job_id)
+        ModerationJob.objects.filter(pk=job_id).update(
+            status=ModerationJob.FAILED, error=str(error),
+            updated=timezone.now())
+        return False
+    return True
+
+
+def job_progress(job_id):
+    """Состояние задачи: action, total, done, finished, error или None."""
+    job = ModerationJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return None
+    return {
+        'action': job.title,
+        'total': job.total,
+        'done': job.done,
+        'finished': job.finished,
+        'error': job.error or None,
+    }
+
+
+def enqueue_job(job_id):
+    get_queue('MODERATION_QUEUE').enqueue(run_job, job_id)
+
+
+def _start_job(job_id, action, title, *payload):
+    ModerationJob.objects.update_or_create(pk=job_id, defaults={
+        'action': action,
+        'title': title,
+        'payload': pickle.dumps(payload),
+        'status': ModerationJob.QUEUED,
+        'step': 0,
+        'last_pk': 0,
+        'total': None,
+        'done': 0,
+        'error': '',
+    })
+    enqueue_job(job_id)
+    return job_id
+
+
+def start_moderation_job(action, posts, *args, title=''):
+    """Ставит action над выборкой posts в очередь, возвращает id задачи."""
+    return _start_job(
+        uuid.uuid4().hex, action, title, posts.query, *args)
+
+
+def account_deletion_job_id(user):
+    return f'account-{user.pk}'
+
+
+def start_account_deletion(user):
+    """Закрывает вход пользователю и ставит удаление его данных в очередь.
+
+    Посты, комментарии и подписки удаляются фоновой задачей пачками,
+    сама учётная запись - последней.
+    """
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+    return _start_job(
+        account_deletion_job_id(user), ACCOUNT_DELETION,
+        f'Удаление пользователя {user}', user.pk)
@@ -0,0 +1,230 @@
+# posts/search.py
+
+import math
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+from .models import Group, Post
+from .utils import CursorPaginator
+
+# Таблицу индекса для каждой базы создаёт миграция 0016_post_search
+SEARCH_TABLE: str = 'posts_search'
+# Длинные запросы обрезаются: каждое слово - отдельный проход по индексу
+MAX_QUERY_TERMS: int = 8
+INDEX_BATCH_SIZE: int = 500
+
+
+def search_terms(query):
+    """Слова запроса без операторов и кавычек языка запросов индекса."""
+    return re.findall(r'\w+', query.lower())[:MAX_QUERY_TERMS]
+
+
+def _tables():
+    return {
+        'posts': Post._meta.db_table,
+        'groups': Group._meta.db_table,
+        'users': get_user_model()._meta.db_table,
+        'search': SEARCH_TABLE,
+    }
+
+
+class SQLiteSearchIndex:
+    """Индекс FTS5: rowid строки индекса - id поста.
+
+    Чем меньше bm25, тем выше запись; совпадение в названии группы и
+    имени автора весит вдвое больше совпадения в тексте.
+    """
+
+    def index(self, cursor, where, params):
+        tables = _tables()
+        cursor.execute(
+            'DELETE FROM {search} WHERE rowid IN '
+            '(SELECT p.id FROM {posts} p WHERE {where})'.format(
+                where=where, **tables),
+            params,
+        )
+        cursor.execute(
+            'INSERT INTO {search} (rowid, title, author, text) '
+            "SELECT p.id, COALESCE(g.title, ''), "
+            "u.username || ' ' || u.first_name || ' ' || u.last_name, p.text "
+            'FROM {posts} p '
+            'JOIN {users} u ON u.id = p.author_id '
+            'LEFT JOIN {groups} g ON g.id = p.group_id '
+            'WHERE {where}'.format(where=where, **tables),
+            params,
+        )
+
+    def remove(self, cursor, post_ids):
+        placeholders = ', '.join(['%s'] * len(post_ids))
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})',
+            post_ids,
+        )
+
+    def match(self, terms):
+        # Каждое слово в кавычках и с *: ищется как префикс, а
+        # пользовательский ввод не разбирается как синтаксис FTS5
+        query = ' '.join(f'"{term}"*' for term in terms)
+        return (
+            f'SELECT rowid AS post_id, '
+            f'bm25({SEARCH_TABLE}, 2.0, 2.0, 1.0) AS score '
+            f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+            [query],
+        )
+
+
+class PostgreSQLSearchIndex:
+    """Таблица tsvector с GIN-индексом.
+
+    ts_rank_cd берётся с минусом, чтобы, как и у bm25, лучшие записи
+    шли первыми по возрастанию score.
+    """
+
+    def index(self, cursor, where, params):
+        config = settings.SEARCH_CONFIG
+        cursor.execute(
+            'INSERT INTO {search} (post_id, document) '
+            'SELECT p.id, '
+            "setweight(to_tsvector(%s::regconfig, COALESCE(g.title, '')), "
+            "'A') || "
+            "setweight(to_tsvector(%s::regconfig, concat_ws(' ', "
+            "u.username, u.first_name, u.last_name)), 'A') || "
+            "setweight(to_tsvector(%s::regconfig, p.text), 'B') "
+            'FROM {posts} p '
+            'JOIN {users} u ON u.id = p.author_id '
+            'LEFT JOIN {groups} g ON g.id = p.group_id '
+            'WHERE {where} '
+            'ON CONFLICT (post_id) '
+            'DO UPDATE SET document = EXCLUDED.document'.format(
+                where=where, **_tables()),
+            [config, config, config, *params],
+        )
+
+    def remove(self, cursor, post_ids):
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE post_id = ANY(%s)',
+            [list(post_ids)],
+        )
+
+    def match(self, terms):
+        query = ' & '.join(f'{term}:*' for term in terms)
+        return (
+            f'SELECT post_id, '
+            f'-ts_rank_cd(document, query)::float8 AS score '
+            f'FROM {SEARCH_TABLE}, to_tsquery(%s::regconfig, %s) query '
+            f'WHERE document @@ query',
+            [settings.SEARCH_CONFIG, query],
+        )
+
+
+SEARCH_INDEXES = {
+    'sqlite': SQLiteSearchIndex,
+    'postgresql': PostgreSQLSearchIndex,
+}
+
+
+def get_search_index(db_connection=connection):
+    try:
+        return SEARCH_INDEXES[db_connection.vendor]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f'Поиск не поддерживает базу {db_connection.vendor}')
+
+
+def _reindex(where, params):
+    with connection.cursor() as cursor:
+        get_search_index().index(cursor, where, params)
+
+
+def index_posts(post_ids):
+    """Обновляет записи индекса для постов с этими id."""
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), INDEX_BATCH_SIZE):
+        batch = post_ids[start:start + INDEX_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        _reindex(f'p.id IN ({placeholders})', batch)
+
+
+def index_group_posts(group_id):
+    _reindex('p.group_id = %s', [group_id])
+
+
+def index_author_posts(author_id):
+    _reindex('p.author_id = %s', [author_id])
+
+
+def remove_posts(post_ids):
+    post_ids = list(post_ids)
+    index = get_search_index()
+    with connection.cursor() as cursor:
+        for start in range(0, len(post_ids), INDEX_BATCH_SIZE):
+            index.remove(cursor, post_ids[start:start + INDEX_BATCH_SIZE])
+
+
+def finite_float(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+class SearchPaginator(CursorPaginator):
+    """Постраничный вывод результатов по ключу (score, id).
+
+    Окно и курсоры общие с CursorPaginator, меняется только источник
+    строк: пары (post_id, score) из индекса, а не queryset постов.
+    """
+    ordering = None
+    key_parsers = (finite_float, int)
+
+    def __init__(self, query, per_page, **kwargs):
+        self.terms = search_terms(query)
+        super().__init__([], per_page, **kwargs)
+
+    def cursor_key(self, row):
+        post_id, score = row
+        return repr(score), post_id
+
+    def _fetch(self, condition, params, order, limit):
+        if not self.terms:
+            return []
+        match_sql, match_params = get_search_index().match(self.terms)
+        sql = (
+            f'SELECT post_id, score FROM ({match_sql}) matches '
+            f'WHERE {condition} ORDER BY {order} LIMIT %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*match_params, *params, limit])
+            return cursor.fetchall()
+
+    def rows_after(self, key, limit):
+        condition, params = '1 = 1', []
+        if key is not None:
+            score, pk = key
+            condition = 'score > %s OR (score = %s AND post_id < %s)'
+            params = [score, score, pk]
+        return self._fetch(condition, params, 'score, post_id DESC', limit)
+
+    def rows_before(self, key, limit):
+        score, pk = key
+        return self._fetch(
+            'score < %s OR (score = %s AND post_id > %s)',
+            [score, score, pk], 'score DESC, post_id', limit,
+        )
+
+    def page_objects(self, rows):
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _ in rows])
+        # Пост мог быть удалён между запросами к индексу и к таблице
+        return [posts[post_id] for post_id, _ in rows if post_id in posts]
+
+
+def search_page(request, per_page=settings.POSTS_PER_PAGE):
+    """Страница результатов поиска по ?q= с курсорами ?after=/?before=."""
+    paginator = SearchPaginator(request.GET.get('q', ''), per_page)
+    return paginator.cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
@@ -0,0 +1,314 @@
+# posts/signals.py
+
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .cache import (GROUPS_FEED, adjust_feed_counts, bump_feeds,
+                    count_feeds, group_feed, post_feed, post_feeds,
+                    profile_feed, timeline_feed)
+from .models import (Comment, Follow, Group, Post, StoredImage, User,
+                     UserStats)
+from .images import delete_image, pregenerate_variants, variants_manifest
+from .search import (index_author_posts, index_group_posts, index_posts,
+                     remove_posts)
+from .thumbnails import get_queue, pregenerate_thumbnails
+from .timeline import (backfill_followers, backfill_timeline, fan_out_post,
+                       prune_timeline)
+
+# Поля пользователя, которые попадают в поисковый индекс его постов
+SEARCH_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+# Какие счётчики UserStats двигает запись каждой модели:
+# (поле с id пользователя, поле счётчика)
+STATS_COUNTERS = {
+    Post: (('author_id', 'posts_count'),),
+    Comment: (('author_id', 'comments_count'),),
+    Follow: (
+        ('author_id', 'followers_count'),
+        ('user_id', 'following_count'),
+    ),
+}
+
+
+def change_stats(instance, delta):
+    for user_field, counter in STATS_COUNTERS[type(instance)]:
+        user_id = getattr(instance, user_field)
+        # Один UPDATE без чтения строки: выполняется в транзакции
+        # самой записи и не теряет параллельные изменения
+        updated = UserStats.objects.filter(user_id=user_id).update(
+            **{counter: Greatest(F(counter) + delta, 0)}
+        )
+        # При удалении строки может уже не быть (каскад от User)
+        if not updated and delta > 0:
+            UserStats.objects.get_or_create(
+                user_id=user_id, defaults={counter: delta}
+            )
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Follow)
+def increase_user_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_stats(instance, 1)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Follow)
+def decrease_user_stats(sender, instance, **kwargs):
+    change_stats(instance, -1)
+
+
+@receiver(post_save, sender=Comment)
+def increase_post_comments_count(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrease_post_comments_count(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=Greatest(F('comments_count') - 1, 0))
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def queue_post_thumbnails(sender, instance, raw, **kwargs):
+    # Превью и варианты строятся сразу после загрузки, а не первым зрителем
+    if not raw and instance.image:
+        pregenerate_thumbnails(instance.image)
+        pregenerate_variants(instance.image)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follower_timeline(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        backfill_timeline(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_follower_timeline(sender, instance, **kwargs):
+    prune_timeline(instance)
+
+
+def enqueue_followers_backfill(author_ids):
+    """После коммита раскладывает посты авторов по лентам подписчиков."""
+    def enqueue():
+        for author_id in author_ids:
+            get_queue('TIMELINE_QUEUE').enqueue(backfill_followers, author_id)
+    transaction.on_commit(enqueue)
+
+
+@receiver(post_delete, sender=Follow)
+def backfill_returned_author(sender, instance, **kwargs):
+    # Счётчик уже уменьшен: ровно порог значит, что до отписки автор
+    # был выше него и его посты в ленты не раскладывались
+    if UserStats.objects.filter(
+        user_id=instance.author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists():
+        enqueue_followers_backfill([instance.author_id])
+
+
+def bump_feeds_on_commit(feeds):
+    # Повторный сдвиг после коммита: иначе соседний запрос успеет
+    # пересобрать кэш по старым данным уже под новым поколением
+    bump_feeds(feeds)
+    transaction.on_commit(partial(bump_feeds, feeds))
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, raw, **kwargs):
+    instance._saved_author_id = None
+    instance._saved_group_id = instance._saved_image = None
+    # Новый файл сохранит PostImageStorage, и ссылку на него учтёт она
+    instance._image_claimed = bool(
+        instance.image) and not instance.image._committed
+    if instance.pk and not raw:
+        saved = Post.objects.filter(pk=instance.pk).values_list(
+            'author_id', 'group_id', 'image').first()
+        if saved is not None:
+            (instance._saved_author_id, instance._saved_group_id,
+             instance._saved_image) = saved
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post_feeds(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    feeds = post_feeds(instance.author_id, instance.group_id)
+    feeds.append(post_feed(instance.pk))
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    if saved_group_id and saved_group_id != instance.group_id:
+        feeds.append(group_feed(saved_group_id))
+    bump_feeds_on_commit(feeds)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_feeds(sender, instance, **kwargs):
+    # Поколение поста сдвигается и при удалении: по нему проверяется
+    # запомненный состав страниц (page_posts_version)
+    bump_feeds_on_commit([
+        *post_feeds(instance.author_id, instance.group_id),
+        post_feed(instance.pk),
+    ])
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    feeds = set(count_feeds(instance.author_id, instance.group_id))
+    saved_feeds = set()
+    if not created and getattr(instance, '_saved_author_id', None):
+        saved_feeds.update(count_feeds(
+            instance._saved_author_id, instance._saved_group_id))
+    # Правка поста меняет только ленты, куда он пришёл или откуда ушёл
+    adjust_feed_counts(feeds - saved_feeds, 1)
+    adjust_feed_counts(saved_feeds - feeds, -1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    adjust_feed_counts(count_feeds(instance.author_id, instance.group_id), -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, raw=False, **kwargs):
+    # Число комментариев выводится в карточке поста
+    if raw or kwargs.get('created') is False:
+        return
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is not None:
+        bump_feeds_on_commit(
+            [*post_feeds(*post), post_feed(instance.post_id)])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_feeds_on_commit([GROUPS_FEED, group_feed(instance.pk)])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follower_timeline(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_feeds_on_commit([
+            timeline_feed(instance.user_id),
+            profile_feed(instance.user_id),
+            profile_feed(instance.author_id),
+        ])
+
+
+def delete_unreferenced_image(name):
+    with transaction.atomic():
+        stored = StoredImage.objects.select_for_update().filter(
+            name=name, references=0).first()
+        if stored is None:
+            return
+        # Манифест вариантов читается, пока строка ещё есть в базе
+        manifest = variants_manifest(name)
+        stored.delete()
+        # Файл удаляется под блокировкой строки: параллельный save той
+        # же картинки дождётся коммита и запишет файл заново
+        delete_image(name, manifest)
+
+
+def change_image_references(name, delta):
+    updated = StoredImage.objects.filter(name=name).update(
+        references=Greatest(F('references') + delta, 0))
+    if not updated and delta > 0:
+        StoredImage.objects.get_or_create(
+            name=name, defaults={'references': delta})
+    if delta < 0:
+        # Файл удаляется только после коммита, чтобы откат не оставил
+        # пост со ссылкой на удалённую картинку
+        transaction.on_commit(partial(delete_unreferenced_image, name))
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    image = instance.image.name or ''
+    saved_image = getattr(instance, '_saved_image', None) or ''
+    claimed = getattr(instance, '_image_claimed', False)
+    if image == saved_image:
+        if claimed:
+            # Загружена та же картинка: лишняя ссылка хранилища снимается
+            change_image_references(image, -1)
+        return
+    if image and not claimed:
+        change_image_references(image, 1)
+    if saved_image:
+        change_image_references(saved_image, -1)
+
+
+@receiver(post_delete, sender=Post)
+def release_post_image(sender, instance, **kwargs):
+    if instance.image:
+        change_image_references(instance.image.name, -1)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw, **kwargs):
+    if not raw:
+        index_posts([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    remove_posts([instance.pk])
+
+
+@receiver(post_save, sender=Group)
+def reindex_group_posts(sender, instance, created, raw, **kwargs):
+    # Название группы ищется вместе с её постами
+    if not created and not raw:
+        index_group_posts(instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    # После удаления у постов уже не найти, в какой группе они были
+    instance._post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def reindex_ungrouped_posts(sender, instance, **kwargs):
+    index_posts(getattr(instance, '_post_ids', []))
+
+
+@receiver(post_save, sender=User)
+def reindex_author_posts(sender, instance, created, raw, update_fields,
+                         **kwargs):
+    if created or raw:
+        return
+    # Вход пользователя сохраняет только last_login, индекс не трогаем
+    if update_fields is not None and not SEARCH_USER_FIELDS & update_fields:
+        return
+    index_author_posts(instance.pk)
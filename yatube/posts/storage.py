@@ -0,0 +1,24 @@
+# posts/storage.py
+
+from django.apps import apps
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+from core.storage import ContentAddressedStorage
+
+
+@deconstructible
+class PostImageStorage(ContentAddressedStorage):
+    """Хранилище картинок постов со счётчиком ссылок StoredImage.
+
+    Ссылка учитывается при сохранении файла под блокировкой строки
+    StoredImage, поэтому освобождение последней ссылки другим постом не
+    удалит файл, который только что получил новый пост (posts.signals).
+    """
+
+    def claim(self, name):
+        # Модель берётся из реестра: posts.models импортирует этот модуль
+        stored_images = apps.get_model('posts', 'StoredImage').objects
+        stored, _ = stored_images.select_for_update().get_or_create(
+            name=name)
+        stored_images.filter(pk=stored.pk).update(
+            references=F('references') + 1)
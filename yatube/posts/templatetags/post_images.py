@@ -0,0 +1,19 @@
+# posts/templatetags/post_images.py
+
+from django import template
+
+from ..images import image_variants
+
+register = template.Library()
+
+# Карточка занимает всю ширину экрана телефона и часть ширины на десктопе
+PICTURE_SIZES: str = '(max-width: 768px) 100vw, 75vw'
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(image):
+    return {
+        'image': image,
+        'variants': image_variants(image),
+        'sizes': PICTURE_SIZES,
+    }
@@ -0,0 +1,207 @@
+# posts/tests/test_admin.py
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.contrib.admin import ACTION_CHECKBOX_NAME
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.paginators import BoundedCountPaginator, EstimatedCountPaginator
+from core.testing import default_queue
+from posts.models import (Comment, Follow, Group, ModerationJob, Post,
+                          UserStats)
+from posts.moderation import run_job
+from posts.search import SearchPaginator
+
+User = get_user_model()
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.author = User.objects.create_user(username='Admin_Author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Пост автора', author=cls.author)
+        Post.objects.create(text='Пост читателя', author=cls.reader)
+        Comment.objects.create(
+            text='Комментарий', author=cls.author, post=cls.post)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        url = reverse(f'admin:posts_{model}_changelist')
+        return self.client.get(url, params)
+
+    def test_search_by_author_username(self):
+        """Поиск по имени автора работает и не зависит от регистра"""
+        lookups = {
+            'post': {'author': 'admin_author'},
+            'comment': {'author': 'admin_author'},
+            'follow': {'q': 'admin_author'},
+        }
+        for model, params in lookups.items():
+            with self.subTest(model=model):
+                response = self.changelist(model, **params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_text_search_does_not_match_username(self):
+        """Поиск по тексту не перебирает имена авторов"""
+        for model in ('post', 'comment'):
+            with self.subTest(model=model):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.changelist(model, q='admin_author')
+                self.assertEqual(response.context['cl'].result_count, 0)
+                self.assertFalse(any(
+                    '"username" LIKE' in query['sql']
+                    for query in queries.captured_queries
+                ))
+
+    def test_author_filter_keeps_other_params(self):
+        """Поле фильтра по автору сохраняет поиск и сортировку"""
+        response = self.changelist('post', q='Пост', o='1')
+        self.assertContains(response, 'name="author"')
+        self.assertContains(response, 'name="q" value="Пост"')
+        self.assertContains(response, 'name="o" value="1"')
+
+    def test_changelist_queries_do_not_grow(self):
+        """Связанные объекты списка грузятся одним запросом"""
+        with CaptureQueriesContext(connection) as before:
+            self.changelist('post')
+        for number in range(5):
+            Post.objects.create(text=f'Пост {number}', author=self.reader)
+        with CaptureQueriesContext(connection) as after:
+            self.changelist('post')
+        self.assertEqual(len(after), len(before))
+        self.assertFalse(any(
+            'COUNT' in query['sql'] and 'LIMIT' not in query['sql']
+            for query in after.captured_queries
+        ))
+
+    def test_count_is_bounded(self):
+        """Paginator считает записи не дальше своей границы"""
+        paginator = BoundedCountPaginator(Post.objects.all(), 1)
+        paginator.count_limit = 1
+        self.assertEqual(paginator.count, 1)
+        self.assertEqual(paginator.num_pages, 1)
+
+    def test_large_count_is_estimated(self):
+        """За границей число записей берётся из статистики базы"""
+        paginator = EstimatedCountPaginator(Post.objects.all(), 1)
+        paginator.count_limit = 1
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(paginator.count, Post.objects.count())
+        self.assertTrue(paginator.estimated)
+        self.assertFalse(paginator.lower_bound)
+
+    def test_filtered_count_without_estimate(self):
+        """Без оценки выводится граница, а не точное число"""
+        queryset = Post.objects.filter(text__startswith='Пост')
+        paginator = EstimatedCountPaginator(queryset, 1)
+        paginator.count_limit = 1
+        self.assertEqual(paginator.count, 1)
+        self.assertTrue(paginator.lower_bound)
+
+    def test_changelist_shows_estimate(self):
+        """Список выводит примерное число записей"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        EstimatedCountPaginator.count_limit = 1
+        try:
+            response = self.changelist('post')
+        finally:
+            del EstimatedCountPaginator.count_limit
+        self.assertContains(response, 'примерно 2')
+
+
+@override_settings(MODERATION_QUEUE='posts.thumbnails.LocalQueue')
+class ModerationActionsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'moderator', 'moderator@example.com', 'password')
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Модерация', slug='moderation', description='Описание')
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.spam = [
+            Post.objects.create(text=f'Спам {number}', author=self.spammer)
+            for number in range(3)
+        ]
+        Comment.objects.create(
+            text='Комментарий', author=self.author, post=self.spam[0])
+        self.post = Post.objects.create(text='Пост', author=self.author)
+
+    def tearDown(self):
+        cache.clear()
+
+    def run_action(self, action, posts, **data):
+        return self.client.post(self.url, {
+            'action': action,
+            ACTION_CHECKBOX_NAME: [post.pk for post in posts],
+            **data,
+        }, follow=True)
+
+    def test_delete_asks_for_confirmation(self):
+        """Удаление сначала показывает страницу подтверждения"""
+        response = self.run_action('delete_posts', self.spam[:1])
+        self.assertTemplateUsed(
+            response, 'admin/posts/post/moderation_confirmation.html')
+        self.assertTrue(Post.objects.filter(pk=self.spam[0].pk).exists())
+
+    def test_delete_posts(self):
+        """Удаление убирает посты, комментарии, счётчики и индекс"""
+        response = self.run_action('delete_posts', self.spam[:2], post='yes')
+        self.assertEqual(Post.objects.filter(author=self.spammer).count(), 1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.spammer).posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).comments_count, 0)
+        self.assertEqual(
+            len(SearchPaginator('спам', 10).cursor_page()), 1)
+        job_url = list(response.context['messages'])[0].message
+        progress = self.client.get(job_url.split('"')[1]).context['progress']
+        self.assertEqual(progress['done'], 2)
+        self.assertTrue(progress['finished'])
+
+    def test_default_queue_runs_actions_in_background(self):
+        """Очередь из настроек проекта не выполняет действия в запросе"""
+        for action in ('delete_posts', 'delete_author_posts'):
+            with self.subTest(action=action):
+                with default_queue('MODERATION_QUEUE') as jobs:
+                    self.run_action(action, self.spam[:1], post='yes')
+                job = ModerationJob.objects.latest('updated')
+                self.assertEqual(jobs, [(run_job, (job.pk,))])
+                self.assertEqual(job.status, ModerationJob.QUEUED)
+                self.assertEqual(
+                    Post.objects.filter(author=self.spammer).count(), 3)
+
+    def test_delete_author_posts(self):
+        """Удаляются все посты автора, а не только выбранные"""
+        self.run_action('delete_author_posts', self.spam[:1], post='yes')
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+    def test_regroup_posts(self):
+        """Перенос в группу виден в постах и в поиске"""
+        self.run_action('regroup_posts', self.spam, group=self.group.pk)
+        self.assertEqual(
+            Post.objects.filter(group=self.group).count(), len(self.spam))
+        self.assertEqual(
+            len(SearchPaginator('модерация', 10).cursor_page()),
+            len(self.spam))
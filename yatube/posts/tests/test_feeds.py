@@ -0,0 +1,86 @@
+# posts/tests/test_feeds.py
+
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.feeds import FEED_ITEMS
+from posts.models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class AtomFeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feed-group', description='Описание')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number} <b>', author=cls.author,
+                 group=cls.group)
+            for number in range(FEED_ITEMS + 5)
+        )
+        cls.urls = (
+            reverse('posts:site_feed'),
+            reverse('posts:group_feed', kwargs={'slug': 'feed-group'}),
+            reverse('posts:author_feed', kwargs={'username': 'feed_author'}),
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    def parse(self, response):
+        return ElementTree.fromstring(response.content)
+
+    def test_feeds_page_by_cursor(self):
+        """Лента отдаёт FEED_ITEMS записей и ссылку на следующие"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('application/atom+xml', response['Content-Type'])
+                feed = self.parse(response)
+                entries = feed.findall(f'{ATOM}entry')
+                self.assertEqual(len(entries), FEED_ITEMS)
+                next_url = feed.find(f'{ATOM}link[@rel="next"]').get('href')
+                feed = self.parse(self.client.get(next_url))
+                self.assertEqual(len(feed.findall(f'{ATOM}entry')), 5)
+                self.assertIsNone(feed.find(f'{ATOM}link[@rel="next"]'))
+
+    def test_post_text_is_escaped(self):
+        """Текст поста попадает в summary экранированным"""
+        summary = self.parse(self.client.get(self.urls[0])).find(
+            f'{ATOM}entry/{ATOM}summary')
+        self.assertIn('&lt;b&gt;', summary.text)
+
+    def test_if_modified_since(self):
+        """Неизменившаяся лента отвечает 304, новый пост - новой версией"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                last_modified = self.client.get(url)['Last-Modified']
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, 304)
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Post.objects.create(
+            text='Свежий пост', author=self.author, group=self.group)
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Свежий пост', response.content.decode())
+
+    def test_missing_group_feed(self):
+        """Лента несуществующей группы - 404"""
+        response = self.client.get(
+            reverse('posts:group_feed', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
@@ -1,13 +1,17 @@
+import hashlib
 import shutil
 import tempfile
 
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from core.images import oversized_upload_message
 from posts.forms import CommentForm, PostForm
 from posts.models import Comment, Group, Post
 
@@ -16,7 +20,8 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   THUMBNAIL_QUEUE='posts.thumbnails.LocalQueue')
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -127,12 +132,11 @@ class PostCreateFormTests(TestCase):
             )
         )
         self.assertEqual(Post.objects.count(), post_count + 1)
-        self.assertTrue(
-            Post.objects.filter(
-                text='Тестовый пост с картинкой',
-                image='posts/small.gif',
-            ).exists()
-        )
+        post = Post.objects.get(text='Тестовый пост с картинкой')
+        # Картинка перекодирована и хранится под хэшем своего содержимого
+        with post.image.open('rb') as image:
+            digest = hashlib.sha256(image.read()).hexdigest()
+        self.assertEqual(post.image.name, f'posts/{digest[:2]}/{digest}.gif')
 
     def test_create_post_with_not_image(self):
         """Пост с не картинкой возвращает ошибку формы"""
@@ -158,6 +162,64 @@ class PostCreateFormTests(TestCase):
             'or a corrupted image.'
         )
 
+    @staticmethod
+    def make_image(name, size=(20, 20), image_format='JPEG', **options):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, image_format, **options)
+        return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100)
+    def test_image_over_pixel_limit_rejected(self):
+        """Картинка больше лимита пикселей отклоняется до декодирования"""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Огромная картинка',
+                  'image': self.make_image('big.jpg')},
+        )
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большое изображение: 20 x 20')
+        self.assertFalse(
+            Post.objects.filter(text='Огромная картинка').exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=10)
+    def test_image_over_size_limit_rejected(self):
+        """Файл больше лимита байт отклоняется ещё при приёме"""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Тяжёлая картинка',
+                  'image': self.make_image('heavy.jpg')},
+        )
+        self.assertFormError(
+            response, 'form', 'image', oversized_upload_message())
+        self.assertFalse(
+            Post.objects.filter(text='Тяжёлая картинка').exists())
+
+    def test_stored_image_named_by_reencoded_hash(self):
+        """Имя сохранённой картинки - хэш уже перекодированного файла"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Картинка по хэшу',
+                  'image': self.make_image('hashed.jpg')},
+        )
+        post = Post.objects.get(text='Картинка по хэшу')
+        with post.image.open('rb') as stored:
+            digest = hashlib.sha256(stored.read()).hexdigest()
+        self.assertIn(digest, post.image.name)
+
+    def test_image_metadata_stripped(self):
+        """EXIF загруженной картинки не сохраняется"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Secret camera'
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Картинка с EXIF',
+                  'image': self.make_image('exif.jpg', exif=exif.tobytes())},
+        )
+        post = Post.objects.get(text='Картинка с EXIF')
+        with post.image.open('rb') as stored:
+            self.assertNotIn(b'Secret camera', stored.read())
+
     def test_create_comment(self):
         """Валидная форма создает запись в Comments."""
         form_data = {
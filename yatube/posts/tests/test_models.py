@@ -1,8 +1,12 @@
 # posts/tests/test_models.py
 
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
-from posts.models import POST_REPR_MAX_CHARS, Comment, Follow, Group, Post
+from posts.models import (POST_REPR_MAX_CHARS, Comment, Follow, Group, Post,
+                          UserStats)
 
 User = get_user_model()
 
@@ -186,3 +190,52 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     follow._meta.get_field(field).help_text,
                     expected_value)
+
+    def test_post_comments_count(self):
+        """Счётчик комментариев поста следует за комментариями."""
+        post = Post.objects.create(author=self.author, text='Тест' * 10)
+        comment = Comment.objects.create(
+            author=self.user, text='Коммент' * 10, post=post)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+
+class UserStatsModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Stats User')
+        cls.author = User.objects.create_user(username='Stats Author')
+
+    def assertStats(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for counter, value in expected.items():
+            with self.subTest(user=user.username, counter=counter):
+                self.assertEqual(getattr(stats, counter), value)
+
+    def test_stats_follow_create_and_delete(self):
+        """Счётчики UserStats меняются при создании и удалении записей."""
+        post = Post.objects.create(author=self.author, text='Тест' * 10)
+        comment = Comment.objects.create(
+            author=self.user, text='Коммент' * 10, post=post)
+        follow = Follow.objects.create(author=self.author, user=self.user)
+        self.assertStats(self.author, posts_count=1, followers_count=1)
+        self.assertStats(self.user, comments_count=1, following_count=1)
+
+        comment.delete()
+        follow.delete()
+        post.delete()
+        self.assertStats(self.author, posts_count=0, followers_count=0)
+        self.assertStats(self.user, comments_count=0, following_count=0)
+
+    def test_reconcile_user_stats_fixes_drift(self):
+        """reconcile_user_stats пересчитывает разошедшиеся счётчики."""
+        Post.objects.create(author=self.author, text='Тест' * 10)
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        UserStats.objects.filter(user=self.user).delete()
+        call_command('reconcile_user_stats', stdout=StringIO())
+        self.assertStats(self.author, posts_count=1)
+        self.assertStats(self.user, posts_count=0)
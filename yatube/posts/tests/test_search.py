@@ -0,0 +1,107 @@
+# posts/tests/test_search.py
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostSearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='search_author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Путешествия',
+            slug='travel',
+            description='Тестовое описание группы',
+        )
+        cls.grouped_post = Post.objects.create(
+            text='Заметки о дороге', author=cls.author, group=cls.group)
+        cls.text_post = Post.objects.create(
+            text='Путешествия по реке и путешествия по морю',
+            author=cls.author,
+        )
+        cls.url = reverse('posts:search')
+
+    def setUp(self):
+        self.client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        return list(response.context['page_obj'])
+
+    def test_search_uses_correct_template(self):
+        """Страница поиска использует свой шаблон"""
+        response = self.client.get(self.url, {'q': 'дорога'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+
+    def test_search_by_text_group_and_author(self):
+        """Ищутся текст записи, название группы и имя автора"""
+        self.assertEqual(self.search('заметки'), [self.grouped_post])
+        self.assertEqual(
+            set(self.search('путешеств')),
+            {self.grouped_post, self.text_post},
+        )
+        self.assertEqual(len(self.search('толстой')), 2)
+        self.assertEqual(self.search('несуществующее'), [])
+        self.assertEqual(self.search('" OR *'), [])
+
+    def test_results_are_ranked(self):
+        """Совпадение в названии группы весит больше, чем в тексте"""
+        self.assertEqual(
+            self.search('путешествия'),
+            [self.grouped_post, self.text_post],
+        )
+
+    def test_index_follows_changes(self):
+        """Правка поста, группы и автора сразу видна в поиске"""
+        # Объекты класса общие для тестов, меняем их копии
+        post = Post.objects.get(pk=self.text_post.pk)
+        post.text = 'Совсем другой текст'
+        post.save()
+        self.assertEqual(self.search('реке'), [])
+        self.assertEqual(self.search('другой'), [post])
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Походы'
+        group.save()
+        self.assertEqual(self.search('походы'), [self.grouped_post])
+        author = User.objects.get(pk=self.author.pk)
+        author.last_name = 'Гоголь'
+        author.save()
+        self.assertEqual(len(self.search('гоголь')), 2)
+        post.delete()
+        self.assertEqual(self.search('другой'), [])
+
+    def test_group_delete_reindexes_posts(self):
+        """После удаления группы её название больше не находит посты"""
+        Group.objects.get(pk=self.group.pk).delete()
+        self.assertEqual(self.search('заметки'), [self.grouped_post])
+        self.assertEqual(self.search('путешествия'), [self.text_post])
+
+    def test_keyset_pagination(self):
+        """Страницы результатов листаются курсорами без повторов"""
+        posts = {
+            Post.objects.create(
+                text=f'Страница поиска {number}', author=self.author)
+            for number in range(15)
+        }
+        response = self.client.get(self.url, {'q': 'страница'})
+        first = list(response.context['page_obj'])
+        after = response.context['page_obj'].paginator.next_cursor
+        self.assertIn(f'after={after}', response.content.decode())
+        response = self.client.get(self.url, {'q': 'страница', 'after': after})
+        second = list(response.context['page_obj'])
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 5)
+        self.assertEqual(set(first) | set(second), posts)
+        self.assertIsNone(response.context['page_obj'].paginator.next_cursor)
+        before = response.context['page_obj'].paginator.previous_cursor
+        self.assertEqual(self.search('страница', before=before), first)
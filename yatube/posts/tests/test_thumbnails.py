@@ -0,0 +1,234 @@
+# posts/tests/test_thumbnails.py
+
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from core.testing import RECORDING_QUEUE, default_queue
+from posts.images import build_variants, variants_manifest
+from posts.models import Post, StoredImage
+from posts.signals import delete_unreferenced_image
+from posts.thumbnails import (POST_THUMBNAILS, LocalQueue, get_queue,
+                              thumbnail_is_ready)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   THUMBNAIL_QUEUE='posts.thumbnails.LocalQueue')
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thumb_author')
+        cls.url = reverse('posts:main_page')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Одинаковые картинки других тестов хранятся под тем же именем
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def create_post(self, name):
+        return Post.objects.create(
+            text='Пост с картинкой', author=self.user,
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+
+    @override_settings(THUMBNAIL_QUEUE=RECORDING_QUEUE)
+    def test_request_never_builds_thumbnail(self):
+        """Пока превью не готово, страница отдаёт заглушку"""
+        queue = get_queue()
+        queue.jobs.clear()
+        self.create_post('queued.gif')
+        jobs = len(queue.jobs)
+        self.assertGreater(jobs, 0)
+        content = self.client.get(self.url).content.decode()
+        self.assertIn('src="data:image/svg+xml', content)
+        self.assertNotIn(settings.MEDIA_URL, content)
+        # Задачи уже в очереди и повторно не ставятся
+        self.assertEqual(len(queue.jobs), jobs)
+
+    def test_default_queue_builds_in_background(self):
+        """Очередь из настроек проекта не строит превью в запросе"""
+        with default_queue('THUMBNAIL_QUEUE') as jobs:
+            self.create_post('background.gif')
+            content = self.client.get(self.url).content.decode()
+        self.assertTrue(jobs)
+        self.assertIn('src="data:image/svg+xml', content)
+        self.assertNotIn(settings.MEDIA_URL, content)
+
+    def test_local_queue_logs_failed_job(self):
+        """Ошибка задачи в LocalQueue пишется в лог с её именем"""
+        def broken_job():
+            raise ValueError
+
+        with self.assertLogs('posts.thumbnails', 'ERROR') as logs:
+            LocalQueue().enqueue(broken_job)
+        self.assertIn('Background job', logs.output[0])
+        self.assertIn('broken_job', logs.output[0])
+
+    def test_thumbnail_built_on_upload(self):
+        """Превью строится при загрузке и сразу попадает в ленту"""
+        self.client.get(self.url)
+        self.create_post('ready.gif')
+        content = self.client.get(self.url).content.decode()
+        self.assertIn('<source type="image/webp"', content)
+        self.assertIn(f'{settings.MEDIA_URL}variants/', content)
+        self.assertNotIn('data:image/svg+xml', content)
+
+    def test_variant_names_are_content_addressed(self):
+        """Одинаковые картинки дают одни и те же файлы вариантов"""
+        post = self.create_post('first.gif')
+        legacy = default_storage.save(
+            'posts/legacy.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(
+            build_variants(post.image.name), build_variants(legacy))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_QUEUE=RECORDING_QUEUE)
+class WarmThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='warm_author')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой', author=cls.user,
+            image=SimpleUploadedFile('warm.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def warm(self):
+        out = StringIO()
+        call_command('warm_thumbnails', workers=0, stdout=out)
+        return out.getvalue()
+
+    def test_command_builds_missing_images(self):
+        """Команда строит превью и варианты, готовые не трогает"""
+        name = self.post.image.name
+        self.assertIn('прогрето: 1', self.warm())
+        for geometry_string, options in POST_THUMBNAILS:
+            self.assertTrue(
+                thumbnail_is_ready(name, geometry_string, options))
+        self.assertIsNotNone(variants_manifest(name))
+        self.assertIn('прогрето: 0', self.warm())
+
+    def test_manifest_survives_cache_eviction(self):
+        """Манифест вариантов после сброса кэша читается из базы"""
+        name = self.post.image.name
+        manifest = build_variants(name)
+        cache.clear()
+        self.assertEqual(variants_manifest(name), manifest)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_QUEUE=RECORDING_QUEUE)
+class StoredImageTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='image_author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def upload(self, name, text='Пост с картинкой'):
+        self.client.post(reverse('posts:post_create'), data={
+            'text': text,
+            'image': SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        })
+        return Post.objects.get(text=text)
+
+    def test_same_image_stored_once(self):
+        """Одинаковые загрузки хранятся одним файлом со счётчиком ссылок"""
+        first = self.upload('first.gif', 'Первый пост')
+        second = self.upload('second.gif', 'Второй пост')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).references, 2)
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется вместе с последним ссылающимся постом"""
+        first = self.upload('first.gif', 'Первый пост')
+        second = self.upload('second.gif', 'Второй пост')
+        name = first.image.name
+        first.delete()
+        self.assertTrue(default_storage.exists(name))
+        # Правка без картинки тоже освобождает ссылку
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': second.pk}),
+            data={'text': 'Второй пост', 'image-clear': 'on'},
+        )
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+
+    def test_reused_name_is_claimed_before_post_save(self):
+        """Имя готового файла отдаётся уже со ссылкой на него"""
+        post = self.upload('first.gif', 'Первый пост')
+        name = post.image.name
+        storage = Post._meta.get_field('image').storage
+        with storage.open(name) as stored:
+            content = ContentFile(stored.read())
+        self.assertEqual(storage.save('posts/again.gif', content), name)
+        post.delete()
+        # Последний пост удалён, но ссылку нового сохранения файл держит
+        delete_unreferenced_image(name)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(StoredImage.objects.get(name=name).references, 1)
+
+    def test_same_image_on_edit_counted_once(self):
+        """Повторная загрузка той же картинки не добавляет ссылку"""
+        post = self.upload('first.gif', 'Первый пост')
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={
+                'text': 'Первый пост',
+                'image': SimpleUploadedFile(
+                    'same.gif', SMALL_GIF, 'image/gif'),
+            },
+        )
+        self.assertEqual(
+            StoredImage.objects.get(name=post.image.name).references, 1)
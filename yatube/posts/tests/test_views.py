@@ -1,12 +1,23 @@
 # posts/tests/test_views.py
 
+from unittest import mock
+
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Comment, Follow, Group, Post
+from core.testing import default_queue
+from posts.management.commands.benchmark_paginator import render_navigator
+from posts.cache import post_feeds, timeline_feed
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+from posts.timeline import backfill_followers
+from posts.utils import page_window
 
 User = get_user_model()
 
@@ -165,14 +176,47 @@ class PostsViewsTests(TestCase):
         url = reverse('posts:main_page')
         response = self.authorized_client.get(url)
         self.assertEqual(len(response.context['page_obj']), 1)
-        post = Post.objects.get(id=self.post.pk)
-        post.delete()
+        # Изменение в обход сигналов кэш не сбрасывает
+        Post.objects.filter(id=self.post.pk).update(text='Новый текст')
         response = self.authorized_client.get(url)
-        # self.assertEqual(post, response.context['page_obj'][0])
-        self. assertIn(post.text, response.content.decode())
+        self. assertIn(self.post.text, response.content.decode())
         cache.clear()
         response = self.authorized_client.get(url)
-        self.assertNotIn(post.text, response.content.decode())
+        self.assertNotIn(self.post.text, response.content.decode())
+
+    def test_feed_cache_invalidated_on_writes(self):
+        """Запись поста, комментария и группы сбрасывает кэш лент"""
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group_1.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user_author.username}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный текст поста'
+        post.save()
+        Comment.objects.create(
+            text='Новый комментарий', author=self.user_author, post=post)
+        self.group_1.title = 'Переименованная группа'
+        self.group_1.save()
+        for url in urls:
+            with self.subTest(url=url):
+                content = self.authorized_client.get(url).content.decode()
+                self.assertIn(post.text, content)
+                self.assertIn('Комментариев: 2', content)
+                self.assertIn(self.group_1.title, content)
+
+    def test_follow_cache_invalidated_on_new_post(self):
+        """Новый пост автора сбрасывает кэш ленты подписчика"""
+        self.authorized_client.force_login(self.user_not_author)
+        url = reverse('posts:follow_index')
+        self.authorized_client.get(url)
+        new_post = Post.objects.create(
+            text='Свежий пост автора', author=self.user_author)
+        content = self.authorized_client.get(url).content.decode()
+        self.assertIn(new_post.text, content)
 
 
 class PaginatorViewsTest(TestCase):
@@ -189,6 +233,9 @@ class PaginatorViewsTest(TestCase):
                 text=f'Тестовый пост номер {count}',
                 author=cls.user)
 
+    def tearDown(self):
+        cache.clear()
+
     def test_first_page_contains_expected_count_of_records(self):
         """Проверяем, что первая страница содержит POSTS_PER_PAGE постов"""
         response = self.authorized_client.get(reverse('posts:main_page'))
@@ -206,3 +253,645 @@ class PaginatorViewsTest(TestCase):
             len(response.context.get('page_obj').object_list),
             self.PAGE_TEST_OFFSET
         )
+
+    def test_cursor_pages_cover_all_records(self):
+        """Проверяем, что курсоры ?after=/?before= листают ленту без
+        пропусков и повторов"""
+        url = reverse('posts:main_page')
+        first_page = self.authorized_client.get(url).context['page_obj']
+        self.assertIsNone(first_page.paginator.previous_cursor)
+        self.assertIsNotNone(first_page.paginator.next_cursor)
+        second_page = self.authorized_client.get(
+            url, {'after': first_page.paginator.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), self.PAGE_TEST_OFFSET)
+        self.assertIsNone(second_page.paginator.next_cursor)
+        shown = list(first_page) + list(second_page)
+        self.assertEqual(
+            shown, list(Post.objects.order_by('-pub_date', '-pk'))
+        )
+        back_page = self.authorized_client.get(
+            url, {'before': second_page.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+
+    def test_cursor_page_runs_no_count_query(self):
+        """Проверяем, что курсорная страница не выполняет COUNT(*)"""
+        url = reverse('posts:main_page')
+        first_page = self.authorized_client.get(url).context['page_obj']
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(
+                url, {'after': first_page.paginator.next_cursor})
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT COUNT(*)')
+            and 'FROM "posts"' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Проверяем, что битый курсор отдаёт первую страницу"""
+        response = self.authorized_client.get(
+            reverse('posts:main_page'), {'after': 'not-a-cursor'}
+        )
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.reader = User.objects.create_user(username='feed_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='feed-group-slug',
+            description='Тестовое описание группы',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': cls.author.username}),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        cache.clear()
+
+    def create_commented_posts(self, count):
+        for number in range(count):
+            post = Post.objects.create(
+                text=f'Тестовый пост номер {number}',
+                author=self.author,
+                group=self.group,
+            )
+            Comment.objects.create(
+                text='Тестовый комментарий',
+                author=self.reader,
+                post=post,
+            )
+
+    def count_feed_queries(self):
+        queries_count = {}
+        for url in self.urls:
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            queries_count[url] = len(queries)
+        return queries_count
+
+    def test_feed_queries_do_not_depend_on_posts_count(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        self.create_commented_posts(1)
+        single_post_queries = self.count_feed_queries()
+        self.create_commented_posts(POSTS_PER_PAGE)
+        full_page_queries = self.count_feed_queries()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    full_page_queries[url], single_post_queries[url]
+                )
+
+    def test_feed_shows_comments_count(self):
+        """Лента показывает число комментариев к посту"""
+        self.create_commented_posts(1)
+        post = Post.objects.get()
+        for url in self.urls:
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.client.get(url)
+                self.assertEqual(
+                    response.context['page_obj'][0].comments_count,
+                    post.comments.count()
+                )
+
+
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='timeline_author')
+        cls.reader = User.objects.create_user(username='timeline_reader')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def get_timeline(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка заполняет ленту старыми постами, отписка очищает её"""
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author.username}))
+        self.assertEqual(self.get_timeline(), [self.old_post])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author.username}))
+        self.assertEqual(self.get_timeline(), [])
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(
+            text='Пост после подписки', author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=new_post).exists())
+        self.assertEqual(self.get_timeline(), [new_post, self.old_post])
+
+    def test_new_post_does_not_bump_follower_keys(self):
+        """Запись поста не трогает ключи лент каждого подписчика"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertNumQueries(0):
+            feeds = post_feeds(self.author.pk, None)
+        self.assertNotIn(timeline_feed(self.reader.pk), feeds)
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        Post.objects.create(text='Пост после кэширования', author=self.author)
+        self.assertIn(
+            'Пост после кэширования', self.client.get(url).content.decode())
+
+    def test_body_cache_hit_runs_no_timeline_query(self):
+        """При попадании в кэш ленты подписок записи не запрашиваются"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.get_timeline()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertIn(self.old_post.text, response.content.decode())
+        timeline_queries = [
+            query['sql'] for query in queries.captured_queries
+            if '"timeline"' in query['sql']
+        ]
+        # Только версия страницы: самая новая входящая запись по индексу
+        self.assertEqual(len(timeline_queries), 1)
+        self.assertIn('MAX(', timeline_queries[0])
+        for query in queries.captured_queries:
+            self.assertNotIn('"posts"."text"', query['sql'])
+
+    def test_page_version_does_not_read_author_keys(self):
+        """Версия ленты подписок не читает ключи каждого автора"""
+        for number in range(3):
+            author = User.objects.create_user(username=f'followed_{number}')
+            Follow.objects.create(user=self.reader, author=author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.get_timeline()
+        with mock.patch.object(
+                cache, 'get_many', wraps=cache.get_many) as get_many:
+            self.client.get(reverse('posts:follow_index'))
+        keys = [key for call in get_many.call_args_list for key in call[0][0]]
+        self.assertTrue(keys)
+        for key in keys:
+            self.assertNotIn('author:', key)
+
+    def test_edited_and_deleted_posts_refresh_cached_page(self):
+        """Правка и удаление поста со страницы обновляют её кэш"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост для правки', author=self.author)
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        post.text = 'Исправленный пост'
+        post.save()
+        content = self.client.get(url).content.decode()
+        self.assertIn('Исправленный пост', content)
+        self.assertNotIn('Пост для правки', content)
+        post.delete()
+        content = self.client.get(url).content.decode()
+        self.assertNotIn('Исправленный пост', content)
+        self.assertIn(self.old_post.text, content)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_read_on_request(self):
+        """Посты популярного автора попадают в ленту при чтении"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(
+            text='Пост популярного автора', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.get_timeline(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_cursor_pages_merge_inbox_and_popular_authors(self):
+        """Курсоры листают входящие и посты популярных авторов вместе"""
+        popular = User.objects.create_user(username='timeline_popular')
+        other = User.objects.create_user(username='timeline_other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=popular)
+        Follow.objects.create(user=other, author=popular)
+        for number in range(POSTS_PER_PAGE):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+            Post.objects.create(text=f'Пост {number}', author=popular)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=popular).exists())
+        url = reverse('posts:follow_index')
+        pages = [self.client.get(url).context['page_obj']]
+        while pages[-1].paginator.next_cursor:
+            pages.append(self.client.get(
+                url, {'after': pages[-1].paginator.next_cursor}
+            ).context['page_obj'])
+        self.assertEqual(
+            [post for page in pages for post in page],
+            list(Post.objects.filter(author__in=[self.author, popular])
+                 .order_by('-pub_date', '-pk')),
+        )
+        back = self.client.get(
+            url, {'before': pages[-1].paginator.previous_cursor})
+        self.assertEqual(list(back.context['page_obj']), list(pages[-2]))
+
+
+class FeedQueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'plan_author_{number}')
+            for number in range(3)
+        ]
+        cls.reader = User.objects.create_user(username='plan_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='plan-group-slug',
+            description='Тестовое описание группы',
+        )
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            for number in range(POSTS_PER_PAGE * 2):
+                post = Post.objects.create(
+                    text=f'Тестовый пост номер {number}',
+                    author=author,
+                    group=cls.group,
+                )
+                Comment.objects.create(
+                    text='Тестовый комментарий', author=cls.reader, post=post)
+        cls.urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': cls.authors[0].username}),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        cache.clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Без этого планировщик выберет Seq Scan на маленьких
+                # таблицах; Seq Scan останется, только если индекса нет
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+                return [
+                    line for (line,) in cursor.fetchall()
+                    if 'Seq Scan' in line
+                ]
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [
+                row[-1] for row in cursor.fetchall()
+                if row[-1].startswith('SCAN') and 'USING' not in row[-1]
+            ]
+
+    def sorts(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN ' + sql)
+                return [
+                    line for (line,) in cursor.fetchall() if 'Sort' in line]
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [
+                row[-1] for row in cursor.fetchall()
+                if 'TEMP B-TREE' in row[-1]
+            ]
+
+    def test_follow_cursor_pages_do_not_sort_timeline(self):
+        """Страница ленты подписок не сортирует все входящие записи"""
+        url = reverse('posts:follow_index')
+        page_obj = self.client.get(url).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            page_obj = self.client.get(
+                url, {'after': page_obj.paginator.next_cursor}
+            ).context['page_obj']
+            list(page_obj)
+        timeline_queries = [
+            query['sql'] for query in queries.captured_queries
+            if '"timeline"' in query['sql']
+        ]
+        self.assertTrue(timeline_queries)
+        for sql in timeline_queries:
+            self.assertEqual(self.sorts(sql), [], sql)
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не читают таблицы целиком"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url, {'page': 2})
+                    page_obj = self.client.get(url).context['page_obj']
+                    self.client.get(
+                        url, {'after': page_obj.paginator.next_cursor})
+                for query in queries.captured_queries:
+                    self.assertEqual(
+                        self.explain(query['sql']), [],
+                        f'Полный проход таблицы в запросе {query["sql"]}'
+                    )
+
+
+class IndexCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cache_user')
+        cls.another_user = User.objects.create_user(username='cache_other')
+        cls.post = Post.objects.create(
+            text='Тестовый пост для кэша', author=cls.user)
+        cls.url = reverse('posts:main_page')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.another_client = Client()
+        self.another_client.force_login(self.another_user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_body_cache_is_shared_and_header_is_personal(self):
+        """Тело главной общее для всех, шапка у каждого своя"""
+        self.authorized_client.get(self.url)
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        content = self.another_client.get(self.url).content.decode()
+        self.assertIn(self.post.text, content)
+        self.assertIn(f'Пользователь: {self.another_user.username}', content)
+        self.assertNotIn(f'Пользователь: {self.user.username}', content)
+
+    def test_guest_page_is_not_served_to_users(self):
+        """Гостевая страница из кэша не отдаётся авторизованным"""
+        self.guest_client.get(self.url)
+        content = self.authorized_client.get(self.url).content.decode()
+        self.assertIn(f'Пользователь: {self.user.username}', content)
+        content = self.guest_client.get(self.url).content.decode()
+        self.assertNotIn(f'Пользователь: {self.user.username}', content)
+
+    def test_body_cache_hit_runs_no_feed_queries(self):
+        """При попадании в кэш тела лента не запрашивается из базы"""
+        self.authorized_client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.another_client.get(self.url)
+        self.assertFalse(any(
+            'FROM "posts"' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='card_author')
+        cls.post = Post.objects.create(
+            text='Тестовый пост для карточки', author=cls.author)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_card_reused_across_feeds(self):
+        """Готовая карточка поста используется в другой ленте"""
+        self.author_client.get(reverse('posts:main_page'))
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        content = self.author_client.get(
+            reverse('posts:profile', kwargs={'username': 'card_author'})
+        ).content.decode()
+        self.assertIn(self.post.text, content)
+
+    def test_card_invalidated_on_edit_and_comment(self):
+        """Правка поста и новый комментарий обновляют карточку"""
+        url = reverse('posts:main_page')
+        self.author_client.get(url)
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Отредактированный текст'},
+        )
+        self.author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Комментарий'},
+        )
+        content = self.author_client.get(url).content.decode()
+        self.assertIn('Отредактированный текст', content)
+        self.assertIn('Комментариев: 1', content)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etag_author')
+        cls.reader = User.objects.create_user(username='etag_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='etag-group', description='Описание')
+        cls.post = Post.objects.create(
+            text='Пост для условного GET', author=cls.author,
+            group=cls.group)
+        cls.urls = (
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+            reverse('posts:profile', kwargs={'username': 'etag_author'}),
+            reverse('posts:group_list', kwargs={'slug': 'etag-group'}),
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_not_modified_without_rendering(self):
+        """Совпавший ETag или дата - 304 без сборки страницы"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                etag = response['ETag']
+                last_modified = response['Last-Modified']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_validators(self):
+        """Комментарий, правка группы и подписка меняют ETag страниц"""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Comment.objects.create(
+            text='Комментарий', author=self.reader, post=self.post)
+        Follow.objects.create(user=self.reader, author=self.author)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_personal_pages_have_own_etag(self):
+        """У авторизованного свой ETag и нет общего Last-Modified"""
+        url = self.urls[1]
+        guest_etag = self.client.get(url)['ETag']
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=guest_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_new_login_changes_personal_etag(self):
+        """После нового входа страница с формой не отдаётся по 304"""
+        url = self.urls[0]
+        self.client.force_login(self.reader)
+        # Первый ответ выдаёт CSRF-cookie, с ней ETag уже не меняется
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.client.logout()
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_missing_object_is_not_found(self):
+        """Для несуществующего объекта view отвечает 404"""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(TIMELINE_FANOUT_LIMIT=1)
+class FanoutThresholdTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='threshold_author')
+        self.readers = [
+            User.objects.create_user(username=f'threshold_reader_{number}')
+            for number in range(2)
+        ]
+        for reader in self.readers:
+            Follow.objects.create(user=reader, author=self.author)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_author_back_under_limit_is_backfilled(self):
+        """Посты, написанные выше порога, раскладываются после отписки"""
+        post = Post.objects.create(
+            text='Пост популярного автора', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.filter(user=self.readers[1]).get().delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.readers[0], post=post).exists())
+        client = Client()
+        client.force_login(self.readers[0])
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_default_queue_backfills_in_background(self):
+        """По умолчанию раскладка уходит в пул, а не в запрос отписки"""
+        Post.objects.create(text='Пост популярного автора', author=self.author)
+        with default_queue('TIMELINE_QUEUE') as jobs:
+            Follow.objects.filter(user=self.readers[1]).get().delete()
+        self.assertEqual(jobs, [(backfill_followers, (self.author.pk,))])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+
+class PageWindowTest(TestCase):
+    def test_page_window_is_elided(self):
+        """Проверяем, что навигатор выводит окно страниц, а не все"""
+        paginator = Paginator(range(1000), 1)
+        self.assertEqual(
+            page_window(paginator.page(500)),
+            [1, None, 498, 499, 500, 501, 502, None, 1000]
+        )
+        self.assertEqual(page_window(paginator.page(1)), [1, 2, 3, None, 1000])
+        self.assertEqual(
+            page_window(Paginator(range(5), 1).page(3)), [1, 2, 3, 4, 5])
+
+    def test_navigator_size_does_not_grow(self):
+        """Проверяем, что размер навигатора не растёт с числом страниц"""
+        small = len(render_navigator(10))
+        huge = len(render_navigator(100000))
+        self.assertLess(huge - small, 100)
+
+
+class FeedCountCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='count_author')
+        cls.group = Group.objects.create(
+            title='Группа счётчика', slug='count-group', description='-')
+        for number in range(POSTS_PER_PAGE + 1):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def page(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            page_obj = self.client.get(url, {'page': 1}).context['page_obj']
+            # При попадании в кэш фрагмента страница считается лениво
+            count = page_obj.paginator.count
+        counts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT COUNT(*)')
+            and 'FROM "posts"' in query['sql']
+        ]
+        return count, len(counts)
+
+    def test_count_cached_and_adjusted(self):
+        """Число постов ленты берётся из кэша и правится сигналами"""
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': 'count-group'}),
+            reverse('posts:profile', kwargs={'username': 'count_author'}),
+        )
+        total = POSTS_PER_PAGE + 1
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.page(url), (total, 1))
+        post = Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.page(url), (total + 1, 0))
+        post.group = None
+        post.save()
+        self.assertEqual(self.page(urls[1]), (total, 0))
+        post.delete()
+        self.assertEqual(self.page(urls[0]), (total, 0))
+
+    @override_settings(FEED_COUNT_STALENESS=0)
+    def test_staleness_setting(self):
+        """Без допустимой задержки число считается при каждом запросе"""
+        url = reverse('posts:main_page')
+        self.page(url)
+        self.assertEqual(self.page(url), (POSTS_PER_PAGE + 1, 1))
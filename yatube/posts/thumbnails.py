@@ -0,0 +1,214 @@
+# posts/thumbnails.py
+
+import atexit
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from urllib.parse import quote
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from .cache import bump_feeds, post_feed, post_feeds
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+JOB_KEY_PREFIX: str = 'thumbnail_job'
+# Задача, потерянная упавшим воркером, снова ставится в очередь
+JOB_TIMEOUT: int = 60 * 5
+
+# Превью, которые шаблоны показывают для Post.image
+POST_THUMBNAILS = (
+    (settings.DEFAULT_IMAGE_SIZE, {'crop': 'center', 'upscale': True}),
+)
+
+PLACEHOLDER_SVG: str = (
+    "<svg xmlns='http://www.w3.org/2000/svg' "
+    "width='{width}' height='{height}'>"
+    "<rect width='100%' height='100%' fill='#e9ecef'/></svg>"
+)
+
+
+class ThumbnailPlaceholder(DummyImageFile):
+    """Заглушка нужного размера, пока превью готовится в фоне."""
+
+    @property
+    def url(self):
+        svg = PLACEHOLDER_SVG.format(width=self.x, height=self.y)
+        return 'data:image/svg+xml,' + quote(svg)
+
+
+def _log_failure(func, future):
+    if future.exception() is not None:
+        logger.error('Background job %s failed', func.__qualname__,
+                     exc_info=future.exception())
+
+
+class LocalQueue:
+    """Очередь для тестов и отладки: задача выполняется сразу в процессе.
+
+    Как и в пуле, ошибка задачи только пишется в лог и не прерывает
+    запрос, поставивший её в очередь.
+    """
+
+    def enqueue(self, func, *args):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Background job %s failed', func.__qualname__)
+
+
+class ProcessPoolQueue:
+    """Пул процессов-воркеров, задачи не держат запрос.
+
+    Очередь по умолчанию для всех фоновых задач. Процессы запускаются
+    через spawn и поднимают Django заново из DJANGO_SETTINGS_MODULE, то
+    есть работают с настроенными базой и кэшем, а не с подменёнными в
+    тестах.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+
+    def _start(self):
+        # В форке пул родителя не наш: его закроет сам родитель
+        if self._executor is not None and self._pid == os.getpid():
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+        self._pid = os.getpid()
+        atexit.register(self.shutdown)
+
+    def shutdown(self, wait=True):
+        """Дожидается задач и останавливает процессы пула."""
+        executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=wait)
+
+    def enqueue(self, func, *args):
+        self._start()
+        try:
+            future = self._executor.submit(func, *args)
+        except BrokenProcessPool:
+            # Пул пересоздаётся со следующей задачей, а эту повторит
+            # запрос страницы после истечения JOB_TIMEOUT
+            logger.exception('Background worker pool is broken')
+            self.shutdown(wait=False)
+            return
+        future.add_done_callback(partial(_log_failure, func))
+
+
+_queues = {}
+
+
+def get_queue(setting='THUMBNAIL_QUEUE'):
+    """Очередь из настройки setting; у каждой настройки свой пул."""
+    key = (setting, getattr(settings, setting))
+    if key not in _queues:
+        _queues[key] = import_string(key[1])()
+    return _queues[key]
+
+
+def refresh_image_feeds(name):
+    """Сбрасывает ленты и карточки постов с этой картинкой."""
+    posts = Post.objects.filter(image=name).values_list(
+        'pk', 'author_id', 'group_id')
+    for pk, author_id, group_id in posts:
+        bump_feeds([*post_feeds(author_id, group_id), post_feed(pk)])
+
+
+def run_image_job(job_key, func, name, *args):
+    """Задача воркера: обработка картинки name функцией func."""
+    try:
+        func(name, *args)
+    finally:
+        cache.delete(job_key)
+    # Ленты и карточки с заглушкой вместо картинки пересобираются
+    refresh_image_feeds(name)
+
+
+def enqueue_image_job(func, name, *args):
+    """Ставит обработку картинки в очередь, если она ещё не там."""
+    # Ключ задачи: функция, картинка и первый параметр, например размер
+    job_key = ':'.join(
+        [JOB_KEY_PREFIX, func.__name__, name, *map(str, args[:1])])
+    if cache.add(job_key, True, JOB_TIMEOUT):
+        get_queue().enqueue(run_image_job, job_key, func, name, *args)
+
+
+def post_image_file(name):
+    # Ключи sorl учитывают хранилище, оно должно совпадать с полем модели
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def generate_thumbnail(name, geometry_string, options):
+    """Строит превью sorl и записывает его в KV-хранилище."""
+    ThumbnailBackend().get_thumbnail(
+        post_image_file(name), geometry_string, **options)
+
+
+def thumbnail_is_ready(name, geometry_string, options):
+    return QueuedThumbnailBackend().get_ready(
+        post_image_file(name), geometry_string, options) is not None
+
+
+def pregenerate_thumbnails(image):
+    for geometry_string, options in POST_THUMBNAILS:
+        enqueue_image_job(
+            generate_thumbnail, image.name, geometry_string, options)
+
+
+class QueuedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который не обрабатывает картинки в запросе.
+
+    Готовое превью берётся из KV-хранилища, иначе его построение
+    ставится в очередь, а шаблон получает заглушку.
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        cached = self.get_ready(source, geometry_string, options)
+        if cached is not None:
+            return cached
+        enqueue_image_job(
+            generate_thumbnail, source.name, geometry_string, options)
+        return ThumbnailPlaceholder(geometry_string)
+
+    def get_ready(self, source, geometry_string, options):
+        """Готовое превью из KV-хранилища или None."""
+        thumbnail = ImageFile(
+            self.thumbnail_name(source, geometry_string, options),
+            default.storage,
+        )
+        return default.kvstore.get(thumbnail) or None
+
+    def thumbnail_name(self, source, geometry_string, options):
+        # Те же умолчания, что подставляет ThumbnailBackend.get_thumbnail,
+        # иначе имя не совпадёт с построенным воркером
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
@@ -0,0 +1,184 @@
+# posts/timeline.py
+
+from heapq import merge
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Max, Q
+
+from .cache import bump_feeds, timeline_feed
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import CursorPaginator, reverse_ordering
+
+FANOUT_BATCH_SIZE: int = 1000
+# Поля ключа ленты во входящих записях
+INBOX_FIELDS = {'pk': 'post_id', '-pk': '-post_id'}
+
+
+def is_fanout_author(author_id):
+    """Посты автора раскладываются по лентам подписчиков при записи.
+
+    У авторов с огромным числом подписчиков раскладка дороже чтения,
+    их посты подмешиваются в ленту при запросе (fan-out-on-read).
+    """
+    return not UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def _bulk_add(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out_post(post):
+    if not is_fanout_author(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _bulk_add(
+        TimelineEntry(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill_timeline(follow):
+    if not is_fanout_author(follow.author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=follow.author_id).values_list('pk', 'pub_date')
+    _bulk_add(
+        TimelineEntry(user_id=follow.user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def backfill_followers(author_id):
+    """Раскладывает все посты автора по лентам всех его подписчиков.
+
+    Нужна, когда автор опустился до TIMELINE_FANOUT_LIMIT подписчиков:
+    посты, написанные выше порога, не раскладывались, а подмешивать их
+    при чтении лента уже перестала. Уже разложенные записи пропускаются.
+    """
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    feeds = []
+    for user_id in follower_ids.iterator():
+        _bulk_add(
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts.iterator()
+        )
+        feeds.append(timeline_feed(user_id))
+    # Старые посты автора не сдвигают самую новую запись ленты
+    bump_feeds(feeds)
+
+
+def prune_timeline(follow):
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+def read_time_authors(user):
+    """id авторов из подписок пользователя, читаемых при запросе."""
+    return list(Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+
+
+def newest_timeline_date(user, read_time_author_ids):
+    """Дата самого нового поста ленты подписок.
+
+    Максимум берётся по индексам входящих записей читателя и постов
+    авторов без раскладки, сколько бы подписок у него ни было.
+    """
+    dates = [TimelineEntry.objects.filter(user=user).aggregate(
+        newest=Max('pub_date'))['newest']]
+    if read_time_author_ids:
+        dates.append(Post.objects.filter(
+            author_id__in=read_time_author_ids,
+        ).aggregate(newest=Max('pub_date'))['newest'])
+    dates = [date for date in dates if date is not None]
+    return max(dates) if dates else None
+
+
+def timeline_posts(user, read_time_author_ids=None):
+    """Лента подписок: входящие записи плюс посты авторов без раскладки.
+
+    Для постраничного вывода с номером страницы; курсорные страницы
+    строит TimelinePaginator без сортировки всей ленты.
+    """
+    inbox = TimelineEntry.objects.filter(user=user).values('post_id')
+    if read_time_author_ids is None:
+        read_time_author_ids = read_time_authors(user)
+    if not read_time_author_ids:
+        return Post.objects.filter(pk__in=inbox)
+    return Post.objects.filter(
+        Q(pk__in=inbox) | Q(author_id__in=read_time_author_ids)
+    )
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорные страницы ленты подписок по ключу (pub_date, id поста).
+
+    Строки - пары (pub_date, post_id): из входящих записей по индексу
+    timeline_user_pub_date_idx и из постов авторов без раскладки по
+    posts_author_pub_date_idx, каждая выборка не длиннее страницы.
+    Слияние двух упорядоченных списков даёт ту же страницу, что и
+    сортировка всей ленты, а посты загружаются только для неё.
+    """
+
+    def __init__(self, object_list, per_page, user, read_time_author_ids,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.user = user
+        self.read_time_author_ids = read_time_author_ids
+
+    def cursor_key(self, row):
+        pub_date, post_id = row
+        return pub_date.isoformat(), post_id
+
+    def _rows(self, key, ordering, limit):
+        inbox_ordering = [INBOX_FIELDS.get(name, name) for name in ordering]
+        sources = [(
+            TimelineEntry.objects.filter(user=self.user),
+            inbox_ordering, ('pub_date', 'post_id'),
+        )]
+        if self.read_time_author_ids:
+            sources.append((
+                Post.objects.filter(author_id__in=self.read_time_author_ids),
+                ordering, ('pub_date', 'pk'),
+            ))
+        rows = []
+        for queryset, source_ordering, fields in sources:
+            if key is not None:
+                queryset = queryset.filter(
+                    self.keyset_filter(key, source_ordering))
+            rows.append(list(queryset.order_by(
+                *source_ordering).values_list(*fields)[:limit]))
+        descending = ordering[0].startswith('-')
+        merged = merge(*rows, reverse=descending)
+        # Пост автора, перешедшего порог, мог остаться и во входящих
+        seen = set()
+        unique = (
+            row for row in merged
+            if row[1] not in seen and not seen.add(row[1])
+        )
+        return list(islice(unique, limit))
+
+    def rows_after(self, key, limit):
+        return self._rows(key, self.ordering, limit)
+
+    def rows_before(self, key, limit):
+        return self._rows(key, reverse_ordering(self.ordering), limit)
+
+    def page_objects(self, rows):
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for _, post_id in rows])
+        # Пост мог быть удалён между выборкой ключей и постов
+        return [posts[post_id] for _, post_id in rows if post_id in posts]
@@ -2,13 +2,14 @@
 
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='main_page'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('search/', views.search, name='search'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
@@ -20,4 +21,9 @@ urlpatterns = [
     path('profile/<str:username>/unfollow/',
          views.profile_unfollow, name='profile_unfollow'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('feeds/atom/', feeds.site_feed, name='site_feed'),
+    path('group/<slug:slug>/atom/', feeds.group_posts_feed,
+         name='group_feed'),
+    path('profile/<str:username>/atom/', feeds.author_posts_feed,
+         name='author_feed'),
 ]
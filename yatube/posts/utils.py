@@ -1,11 +1,260 @@
+import base64
+import binascii
+import operator
+from collections.abc import Sequence
+from functools import reduce
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .cache import feed_count
 
 POSTS_PER_PAGE = settings.POSTS_PER_PAGE
 
+CURSOR_SEPARATOR: str = '|'
+
+# Окно навигатора: страниц по обе стороны от текущей и у краёв списка
+PAGE_WINDOW_SIDE: int = 2
+PAGE_WINDOW_ENDS: int = 1
+
+
+def encode_cursor(key):
+    """Курсор из значений ключа записи, уже приведённых к строкам."""
+    raw = CURSOR_SEPARATOR.join(map(str, key))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, parsers):
+    """Значения ключа, разобранные parsers, или None для битого курсора.
+
+    Парсер возвращает None или бросает ValueError на негодное значение.
+    """
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        values = raw.split(CURSOR_SEPARATOR)
+        if len(values) != len(parsers):
+            return None
+        key = tuple(parse(value) for parse, value in zip(parsers, values))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if None in key:
+        return None
+    return key
+
+
+def field_parser(field):
+    """Парсер значения курсора для поля модели: None вместо ошибки."""
+    def parse(value):
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            return None
+    return parse
+
+
+def reverse_ordering(ordering):
+    return tuple(
+        name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+
+class CursorRows(Sequence):
+    """Объекты страницы CursorPaginator, читаемые при первом обращении.
+
+    Страница создаётся сразу, а запрос к базе выполняется, только когда
+    шаблон действительно выводит записи: при попадании в кэш фрагмента
+    ленты его не будет вовсе.
+    """
+
+    def __init__(self, paginator):
+        self.paginator = paginator
+
+    def __getitem__(self, index):
+        return self.paginator.objects[index]
+
+    def __len__(self):
+        return len(self.paginator.objects)
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу из полей ordering без COUNT и OFFSET.
+
+    Страница N стоит столько же, сколько первая: выборка идёт по индексу
+    от последней показанной записи, общее число записей не считается.
+    Поля ordering вместе должны быть уникальны, поэтому последним идёт
+    pk; по умолчанию это лента постов (pub_date, id), новые первыми.
+    Один paginator - одна страница: курсоры соседних страниц, как и
+    сами записи, считаются лениво и хранятся в нём.
+
+    Наследник с другим источником строк переопределяет ordering,
+    rows_after, rows_before, cursor_key и key_parsers, а при
+    необходимости и page_objects; окно, курсоры и ленивая страница
+    остаются общими.
+    """
+    keyset = True
+    after = before = None
+    ordering = ('-pub_date', '-pk')
+
+    def __init__(self, object_list, per_page, ordering=None, **kwargs):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        if self.ordering:
+            object_list = object_list.order_by(*self.ordering)
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def key_fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    @cached_property
+    def key_parsers(self):
+        opts = self.object_list.model._meta
+        return tuple(
+            field_parser(opts.pk if name == 'pk' else opts.get_field(name))
+            for name in self.key_fields
+        )
+
+    def cursor_key(self, row):
+        values = (getattr(row, name) for name in self.key_fields)
+        return tuple(
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        )
+
+    def keyset_filter(self, key, ordering):
+        """Условие «после key» для порядка ordering.
+
+        Для ('-pub_date', '-pk') это pub_date < d OR (pub_date = d AND
+        pk < id): по каждому полю - строго дальше при равных предыдущих.
+        """
+        fields = [name.lstrip('-') for name in ordering]
+        clauses = []
+        for index, name in enumerate(ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            clause = dict(zip(fields[:index], key[:index]))
+            clause[f'{fields[index]}__{lookup}'] = key[index]
+            clauses.append(Q(**clause))
+        return reduce(operator.or_, clauses)
+
+    def rows_after(self, key, limit):
+        """До limit строк после ключа key (None - с начала) по порядку."""
+        queryset = self.object_list
+        if key is not None:
+            queryset = queryset.filter(self.keyset_filter(key, self.ordering))
+        return list(queryset[:limit])
+
+    def rows_before(self, key, limit):
+        """До limit строк перед ключом key, ближайшие первыми."""
+        ordering = reverse_ordering(self.ordering)
+        return list(self.object_list.filter(
+            self.keyset_filter(key, ordering)
+        ).order_by(*ordering)[:limit])
+
+    def page_objects(self, rows):
+        return rows
+
+    @cached_property
+    def window(self):
+        """Строки страницы и флаги (has_previous, has_next)."""
+        limit = self.per_page + 1
+        if self.before is not None:
+            rows = self.rows_before(self.before, limit)
+            return rows[:self.per_page][::-1], len(rows) > self.per_page, True
+        rows = self.rows_after(self.after, limit)
+        has_previous = self.after is not None
+        return rows[:self.per_page], has_previous, len(rows) > self.per_page
+
+    @cached_property
+    def objects(self):
+        return self.page_objects(self.window[0])
+
+    @property
+    def next_cursor(self):
+        rows, _, has_next = self.window
+        if rows and has_next:
+            return encode_cursor(self.cursor_key(rows[-1]))
+        return None
+
+    @property
+    def previous_cursor(self):
+        rows, has_previous, _ = self.window
+        if rows and has_previous:
+            return encode_cursor(self.cursor_key(rows[0]))
+        return None
+
+    def cursor_page(self, after=None, before=None):
+        self.after = decode_cursor(after, self.key_parsers)
+        self.before = None
+        if self.after is None:
+            self.before = decode_cursor(before, self.key_parsers)
+        return Page(CursorRows(self), 1, self)
+
+
+class FeedCountPaginator(Paginator):
+    """Paginator с числом постов ленты из кэша вместо COUNT(*)."""
+
+    def __init__(self, object_list, per_page, feed, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.feed = feed
+
+    @cached_property
+    def count(self):
+        return feed_count(self.feed, self.object_list)
+
+
+def page_window(page, on_each_side=PAGE_WINDOW_SIDE,
+                on_ends=PAGE_WINDOW_ENDS):
+    """Номера страниц для навигатора, None - пропуск между ними.
+
+    Вместо всех страниц выводятся первые и последние on_ends и по
+    on_each_side вокруг текущей, так что размер навигатора не зависит
+    от числа страниц.
+    """
+    number, num_pages = page.number, page.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        return list(range(1, num_pages + 1))
+    window = []
+    if number > on_ends + on_each_side + 2:
+        window.extend(range(1, on_ends + 1))
+        window.append(None)
+        window.extend(range(number - on_each_side, number + 1))
+    else:
+        window.extend(range(1, number + 1))
+    if number < num_pages - on_ends - on_each_side - 1:
+        window.extend(range(number + 1, number + on_each_side + 1))
+        window.append(None)
+        window.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        window.extend(range(number + 1, num_pages + 1))
+    return window
+
+
+def paginator_(request, posts_list, posts_per_page=POSTS_PER_PAGE,
+               count_feed=None, cursor_paginator=CursorPaginator):
+    """Страница ленты; count_feed - лента, чьё число постов кэшируется.
 
-def paginator_(request, posts_list, posts_per_page=POSTS_PER_PAGE):
-    paginator = Paginator(posts_list, posts_per_page)
+    cursor_paginator строит курсорный paginator по (posts_list,
+    posts_per_page), если у ленты свой источник строк.
+    """
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    # Явный номер страницы - классическая постраничка со счётчиком,
+    # во всех остальных случаях листаем ленту курсорами ?after=/?before=
+    if page_number is not None:
+        if count_feed is None:
+            paginator = Paginator(posts_list, posts_per_page)
+        else:
+            paginator = FeedCountPaginator(
+                posts_list, posts_per_page, count_feed)
+        page = paginator.get_page(page_number)
+        page.page_window = page_window(page)
+        return page
+    paginator = cursor_paginator(posts_list, posts_per_page)
+    return paginator.cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
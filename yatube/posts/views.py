@@ -1,44 +1,116 @@
 # posts/views.py
 
+from functools import partial
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db.models import Max
 from django.http import HttpResponseNotAllowed
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.utils.functional import SimpleLazyObject
+from core.cache import cache_page_for_anonymous, conditional_page
 
+from .cache import (GLOBAL_FEED, GROUPS_FEED, author_feed, feed_version,
+                    group_feed, page_posts_version, page_validators,
+                    post_cards, post_feed, profile_feed, timeline_feed)
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .search import search_page
+from .timeline import (TimelinePaginator, newest_timeline_date,
+                       read_time_authors, timeline_posts)
 from .utils import paginator_
 
 
-@cache_page(settings.CASHE_TIMEOUT, key_prefix='index_page')
+def index_page_version(request):
+    return feed_version(GLOBAL_FEED, GROUPS_FEED)
+
+
+# Валидаторы условного GET: один запрос за id и временем самой новой
+# записи, остальное - поколения лент из кэша
+
+
+def group_page_validators(request, slug):
+    group = Group.objects.filter(slug=slug).annotate(
+        latest=Max('posts__pub_date')).values_list('pk', 'latest').first()
+    if group is None:
+        return None
+    group_id, latest = group
+    return page_validators(
+        request, [group_feed(group_id), GROUPS_FEED], latest)
+
+
+def profile_page_validators(request, username):
+    author = User.objects.filter(username=username).annotate(
+        latest=Max('posts__pub_date')).values_list('pk', 'latest').first()
+    if author is None:
+        return None
+    author_id, latest = author
+    return page_validators(
+        request,
+        [author_feed(author_id), profile_feed(author_id), GROUPS_FEED],
+        latest,
+    )
+
+
+def post_page_validators(request, post_id):
+    post = Post.objects.filter(pk=post_id).annotate(
+        latest_comment=Max('comments__created')).values_list(
+        'author_id', 'pub_date', 'latest_comment').first()
+    if post is None:
+        return None
+    author_id, pub_date, latest_comment = post
+    # Карточка автора выводит число его постов
+    return page_validators(
+        request,
+        [post_feed(post_id), author_feed(author_id), GROUPS_FEED],
+        max(pub_date, latest_comment or pub_date),
+    )
+
+
+@cache_page_for_anonymous(
+    settings.CASHE_TIMEOUT, 'index_page', version=index_page_version)
 def index(request):
     template = 'posts/index.html'
     posts_list = Post.objects.select_related(
         'author', 'group').all()
-    page_obj = paginator_(request, posts_list)
+    # Тело ленты общее для всех и кэшируется в шаблоне, страница
+    # постов считается только при промахе этого кэша
+    page_obj = SimpleLazyObject(
+        lambda: paginator_(request, posts_list, count_feed=GLOBAL_FEED))
     context = {
         'page_obj': page_obj,
+        'post_cards': SimpleLazyObject(lambda: post_cards(page_obj)),
+        'feed_version': feed_version(GLOBAL_FEED, GROUPS_FEED),
+        'cache_timeout': settings.CASHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@conditional_page(group_page_validators)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     group_posts = group.posts.select_related(
-        'author').all()
-    page_obj = paginator_(request, group_posts)
+        'author', 'group').all()
+    page_obj = SimpleLazyObject(lambda: paginator_(
+        request, group_posts, count_feed=group_feed(group.pk)))
     context = {
         'group': group,
         'page_obj': page_obj,
+        'post_cards': SimpleLazyObject(
+            lambda: post_cards(page_obj, group=group)),
+        'feed_version': feed_version(group_feed(group.pk), GROUPS_FEED),
+        'cache_timeout': settings.CASHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@conditional_page(profile_page_validators)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     # follow_flag:
     # ( 0) - Подписки нет
     # ( 1) - Подписка существует
@@ -53,24 +125,44 @@ def profile(request, username):
         elif author == user:
             follow_flag = -1
     author_posts = author.posts.select_related(
-        'group').all()
-    page_obj = paginator_(request, author_posts)
+        'author', 'group').all()
+    page_obj = SimpleLazyObject(lambda: paginator_(
+        request, author_posts, count_feed=author_feed(author.pk)))
 
     context = {
         'author': author,
         'page_obj': page_obj,
+        'post_cards': SimpleLazyObject(lambda: post_cards(page_obj)),
         'follow_flag': follow_flag,
+        'feed_version': feed_version(author_feed(author.pk), GROUPS_FEED),
+        'cache_timeout': settings.CASHE_TIMEOUT,
+    }
+    return render(request, template, context)
+
+
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = search_page(request)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'post_cards': post_cards(page_obj),
+        # Курсоры страниц добавляются к уже введённому запросу
+        'page_query': urlencode({'q': query}) + '&',
     }
     return render(request, template, context)
 
 
+@conditional_page(post_page_validators)
 def post_detail(request, post_id):
 
     if request.method != 'GET' and request.method != 'POST':
         return HttpResponseNotAllowed()
 
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
     comments = post.comments.select_related('author')
     form = CommentForm(request.POST or None)
     context = {
@@ -152,10 +244,32 @@ def add_comment(request, post_id):
 def follow_index(request):
     template = 'posts/follow.html'
     user = get_object_or_404(User, username=request.user.username)
-    post_list = Post.objects.filter(author__following__user=user)
-    page_obj = paginator_(request, post_list)
+    read_time_ids = read_time_authors(user)
+    post_list = timeline_posts(user, read_time_ids).select_related(
+        'author', 'group')
+    # Страница курсорной ленты сама читает записи лениво, а тип Page
+    # страницы подписок должен остаться точным, без SimpleLazyObject
+    page_obj = paginator_(
+        request, post_list,
+        cursor_paginator=partial(
+            TimelinePaginator, user=user,
+            read_time_author_ids=read_time_ids),
+    )
+    # Лента подписок меняется с подпиской (поколение ленты читателя) и
+    # с новым постом любого из авторов (самая новая запись ленты), а
+    # правки постов страницы ловят их поколения
+    version = '{}:{}:{}'.format(
+        feed_version(timeline_feed(user.pk), GROUPS_FEED),
+        newest_timeline_date(user, read_time_ids),
+        ','.join(map(str, read_time_ids)),
+    )
+    posts_version = page_posts_version(
+        f'follow:{version}:{request.GET.urlencode()}', lambda: page_obj)
     context = {
         'page_obj': page_obj,
+        'post_cards': SimpleLazyObject(lambda: post_cards(page_obj)),
+        'feed_version': f'{version};{posts_version}',
+        'cache_timeout': settings.CASHE_TIMEOUT,
     }
     return render(request, template, context)
 
@@ -0,0 +1,116 @@
+# users/tests/test_views.py
+
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from core.testing import RECORDING_QUEUE, default_queue
+from posts.models import (Comment, Follow, ModerationJob, Post, TimelineEntry,
+                          UserStats)
+from posts.moderation import account_deletion_job_id, job_progress, run_job
+
+User = get_user_model()
+
+
+class AccountDeletionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='leaving')
+        self.client = Client()
+        self.client.force_login(self.user)
+        own_post = Post.objects.create(text='Свой пост', author=self.user)
+        other_post = Post.objects.create(text='Чужой пост', author=self.reader)
+        Comment.objects.create(
+            text='Комментарий', author=self.user, post=own_post)
+        Comment.objects.create(
+            text='Комментарий', author=self.user, post=other_post)
+        Follow.objects.create(user=self.reader, author=self.user)
+        Follow.objects.create(user=self.user, author=self.reader)
+        self.url = reverse('users:kmp', args=[self.user.username])
+
+    def tearDown(self):
+        cache.clear()
+
+    @override_settings(MODERATION_QUEUE=RECORDING_QUEUE)
+    def test_request_only_deactivates_account(self):
+        """Запрос лишь закрывает вход, данные удаляет фоновая задача"""
+        self.client.get(self.url)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(Post.objects.filter(author=self.user).exists())
+        progress = job_progress(account_deletion_job_id(self.user))
+        self.assertFalse(progress['finished'])
+
+    def test_default_queue_deletes_in_background(self):
+        """Очередь из настроек проекта не удаляет аккаунт в запросе"""
+        with default_queue('MODERATION_QUEUE') as jobs:
+            self.client.get(self.url)
+        job_id = account_deletion_job_id(self.user)
+        self.assertEqual(jobs, [(run_job, (job_id,))])
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+        self.assertTrue(Post.objects.filter(author=self.user).exists())
+        self.assertEqual(Comment.objects.filter(author=self.user).count(), 2)
+        self.assertEqual(
+            ModerationJob.objects.get(pk=job_id).status,
+            ModerationJob.QUEUED)
+
+    @override_settings(MODERATION_QUEUE='posts.thumbnails.LocalQueue')
+    def test_background_job_deletes_account(self):
+        """Задача удаляет данные пачками, поправив счётчики других"""
+        self.client.get(self.url)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        stats = UserStats.objects.get(user=self.reader)
+        self.assertEqual(
+            (stats.followers_count, stats.following_count), (0, 0))
+        other_post = Post.objects.get(author=self.reader)
+        self.assertEqual(other_post.comments_count, 0)
+        progress = job_progress(account_deletion_job_id(self.user))
+        self.assertTrue(progress['finished'])
+        self.assertEqual(progress['done'], progress['total'])
+
+    def resume_jobs(self, *args):
+        with override_settings(
+                MODERATION_QUEUE='posts.thumbnails.LocalQueue'):
+            call_command(
+                'resume_moderation_jobs', '--stale-minutes', '0', *args,
+                stdout=StringIO())
+
+    @override_settings(MODERATION_QUEUE=RECORDING_QUEUE)
+    def test_lost_job_resumed_by_command(self):
+        """Задачу, потерянную очередью, доводит до конца команда"""
+        self.client.get(self.url)
+        self.resume_jobs()
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        progress = job_progress(account_deletion_job_id(self.user))
+        self.assertTrue(progress['finished'])
+        self.assertEqual(progress['done'], progress['total'])
+
+    @override_settings(MODERATION_QUEUE='posts.thumbnails.LocalQueue')
+    def test_failed_job_continues_from_last_step(self):
+        """Упавшая задача продолжает с шага, на котором остановилась"""
+        with mock.patch('posts.moderation.delete_comments',
+                        side_effect=RuntimeError('сбой')), \
+                self.assertLogs('posts.moderation', 'ERROR'):
+            self.client.get(self.url)
+        job = ModerationJob.objects.get(pk=account_deletion_job_id(self.user))
+        self.assertEqual(
+            (job.status, job.step, job.error),
+            (ModerationJob.FAILED, 1, 'сбой'))
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
+        self.resume_jobs()
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+        self.resume_jobs('--retry-failed')
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        progress = job_progress(account_deletion_job_id(self.user))
+        self.assertEqual(
+            (progress['done'], progress['error']), (progress['total'], None))
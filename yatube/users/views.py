@@ -7,6 +7,7 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 from posts.models import User
+from posts.moderation import start_account_deletion
 
 from .forms import AccountForm, CreationForm
 
@@ -75,7 +76,9 @@ class PasswordResetCompleteView(auth_.PasswordResetCompleteView):
 
 
 # Если не срослось
-def kill_me_please(request):
+def kill_me_please(request, username=None):
     user = get_object_or_404(User, username=request.user.username)
-    user.delete()
+    # Вход закрывается сразу, а посты, комментарии и подписки удаляет
+    # фоновая задача пачками, не держа запрос и блокировки таблиц
+    start_account_deletion(user)
     return redirect('users:logout')
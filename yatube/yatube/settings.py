@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
@@ -155,6 +156,21 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Приём файла больше IMAGE_UPLOAD_MAX_BYTES обрывается на лету
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandlers.UploadSizeLimitHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# Лимиты загружаемых картинок: проверяются по заголовку до декодирования,
+# а перекодирование идёт в отдельном процессе с ограниченной памятью
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv('IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 ** 2))
+IMAGE_UPLOAD_MAX_PIXELS = int(os.getenv('IMAGE_UPLOAD_MAX_PIXELS', 25_000_000))
+IMAGE_UPLOAD_MAX_SIDE = int(os.getenv('IMAGE_UPLOAD_MAX_SIDE', 10_000))
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_REENCODE_MEMORY_LIMIT = int(
+    os.getenv('IMAGE_REENCODE_MEMORY_LIMIT', 512 * 1024 ** 2))
+IMAGE_REENCODE_TIMEOUT = int(os.getenv('IMAGE_REENCODE_TIMEOUT', 30))
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
@@ -163,9 +179,17 @@ ADMINS = os.getenv('ADMINS', EXAMPLE_EMAIL).split(' ')
 
 MANAGERS = os.getenv('MANAGERS', EXAMPLE_EMAIL).split(' ')
 
+# Кэш в общем файле SQLite: все воркеры на хосте видят одни и те же
+# записи и одни и те же сбросы
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'default.db')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+        },
     }
 }
 
@@ -180,5 +204,34 @@ sentry_sdk.init(
 # Project constants
 
 POSTS_PER_PAGE: int = 10
-CASHE_TIMEOUT: int = 20
+# Кэш лент сбрасывается сигналами, TTL лишь страховка
+CASHE_TIMEOUT: int = 60 * 60 * 3
+# Сколько секунд число постов ленты может не пересчитываться
+# (posts.cache.feed_count): между пересчётами его правят сигналы
+FEED_COUNT_STALENESS: int = int(os.getenv('FEED_COUNT_STALENESS', 60 * 10))
+# Авторы с большим числом подписчиков читаются в ленту при запросе
+TIMELINE_FANOUT_LIMIT: int = 10000
 DEFAULT_IMAGE_SIZE: str = '600x200'
+# Ширины вариантов картинки поста для srcset, пропорции DEFAULT_IMAGE_SIZE
+IMAGE_VARIANT_WIDTHS: tuple = (320, 600, 1200)
+# Конфигурация полнотекстового поиска PostgreSQL (posts.search)
+SEARCH_CONFIG: str = os.getenv('SEARCH_CONFIG', 'russian')
+
+# Превью картинок строятся в пуле воркеров, страница их только читает;
+# posts.thumbnails.LocalQueue выполняет задачи в запросе, она для тестов
+# (yatube.test_settings) и отладки
+THUMBNAIL_BACKEND = 'posts.thumbnails.QueuedThumbnailBackend'
+THUMBNAIL_QUEUE = os.getenv(
+    'THUMBNAIL_QUEUE', 'posts.thumbnails.ProcessPoolQueue')
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+# Массовые действия модераторов и удаление аккаунта - в том же пуле
+MODERATION_QUEUE = os.getenv(
+    'MODERATION_QUEUE', 'posts.thumbnails.ProcessPoolQueue')
+# Раскладка постов автора, вернувшегося под TIMELINE_FANOUT_LIMIT: до
+# TIMELINE_FANOUT_LIMIT подписчиков на каждый пост, только в фоне
+TIMELINE_QUEUE = os.getenv(
+    'TIMELINE_QUEUE', 'posts.thumbnails.ProcessPoolQueue')
+# Метаданные превью хранятся в индексированной таблице thumbnail_kvstore,
+# кэш перед ней общий для воркеров; перед выкладкой их прогревает
+# manage.py warm_thumbnails
+THUMBNAIL_KVSTORE = 'sorl.thumbnail.kvstores.cached_db_kvstore.KVStore'
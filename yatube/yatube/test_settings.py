@@ -0,0 +1,28 @@
+# yatube/test_settings.py
+
+# Настройки тестов: manage.py test и pytest.ini подключают их вместо
+# yatube.settings. Пул воркеров поднимает Django заново и работал бы
+# с настоящей базой, поэтому фоновые задачи здесь выполняются сразу
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+THUMBNAIL_QUEUE = 'posts.thumbnails.LocalQueue'
+MODERATION_QUEUE = 'posts.thumbnails.LocalQueue'
+TIMELINE_QUEUE = 'posts.thumbnails.LocalQueue'
+
+# Тесты сбрасывают кэш: у каждого запуска свой файл, а не общий файл
+# работающего на этом хосте сайта
+CACHE_DIR = tempfile.mkdtemp(prefix='yatube-test-cache-')
+atexit.register(shutil.rmtree, CACHE_DIR, ignore_errors=True)
+CACHES = {
+    **CACHES,
+    'default': {
+        **CACHES['default'],
+        'LOCATION': os.path.join(CACHE_DIR, 'cache.db'),
+    },
+}
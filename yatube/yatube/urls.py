@@ -15,6 +15,7 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     # path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
     path('admin/', admin.site.urls),
 ]
 